@@ -11,3 +11,32 @@ REQUIRED_KEYS = [
     "reviews",
     "description",
 ]
+# Written by the LLM (a one-sentence summary) rather than read off the card,
+# so a CSS schema cannot extract them; schema mode neither validates nor requires them.
+LLM_ONLY_KEYS = ["description"]
+
+# Render each listing page once and run both the "No Results Found" check and
+# the LLM extraction on that single result (False restores the double fetch).
+SINGLE_RENDER = True
+
+# How listing pages are walked:
+#   "serial"    - one page after another until "No Results Found"
+#   "pipelined" - render PIPELINE_LOOKAHEAD pages ahead of LLM extraction
+#   "planned"   - probe for the last page, then crawl all pages concurrently
+# "pipelined" and "planned" are opt-in: they render ahead and run LLM calls in parallel.
+CRAWL_MODE = "serial"
+
+# Number of pages rendered ahead of the page currently going through the LLM.
+PIPELINE_LOOKAHEAD = 2
+
+# Number of concurrent browser sessions used by the "planned" mode.
+PAGE_RANGE_CONCURRENCY = 4
+
+# How venues are extracted from each page:
+#   "llm"    - LLM extraction on every page
+#   "schema" - the LLM induces a CSS schema once from SCHEMA_SAMPLE_PAGES pages,
+#              then every page is extracted with that schema and no LLM calls
+EXTRACTION_MODE = "llm"
+
+# Listing pages rendered to induce (first half) and validate (second half) the schema.
+SCHEMA_SAMPLE_PAGES = 4
@@ -1,16 +1,40 @@
 import asyncio
+import sys
+import time
+from collections import deque
+from pathlib import Path
 
 from crawl4ai import AsyncWebCrawler
 from dotenv import load_dotenv
 
-from config import BASE_URL, CSS_SELECTOR, REQUIRED_KEYS
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for crawl_common
+from crawl_common.rate_limit import HostRateLimiter
+
+from config import (
+    BASE_URL,
+    CRAWL_MODE,
+    CSS_SELECTOR,
+    EXTRACTION_MODE,
+    LLM_ONLY_KEYS,
+    PAGE_RANGE_CONCURRENCY,
+    PIPELINE_LOOKAHEAD,
+    REQUIRED_KEYS,
+    SCHEMA_SAMPLE_PAGES,
+    SINGLE_RENDER,
+)
 from utils.data_utils import (
     save_venues_to_csv,
 )
 from utils.scraper_utils import (
+    ProbeError,
+    crawl_page_range,
     fetch_and_process_page,
+    find_last_page,
     get_browser_config,
-    get_llm_strategy,
+    get_extraction_strategy,
+    new_page_timings,
+    process_rendered_page,
+    render_page,
 )
 
 load_dotenv()
@@ -22,8 +46,8 @@ async def crawl_venues():
     """
     # Initialize configurations
     browser_config = get_browser_config()
-    llm_strategy = get_llm_strategy()
     session_id = "venue_crawl_session"
+    rate_limiter = HostRateLimiter()
 
     # Initialize state variables
     page_number = 1
@@ -33,6 +57,13 @@ async def crawl_venues():
     # Start the web crawler context
     # https://docs.crawl4ai.com/api/async-webcrawler/#asyncwebcrawler
     async with AsyncWebCrawler(config=browser_config) as crawler:
+        # Politeness comes from the per-host budget in crawl_common.rate_limit
+        rate_limiter.attach(crawler)
+        llm_strategy, required_keys = await get_extraction_strategy(
+            crawler, BASE_URL, CSS_SELECTOR, session_id, REQUIRED_KEYS,
+            mode=EXTRACTION_MODE, sample_pages=SCHEMA_SAMPLE_PAGES,
+            llm_only_keys=LLM_ONLY_KEYS,
+        )
         while True:
             # Fetch and process data from the current page
             venues, no_results_found = await fetch_and_process_page(
@@ -42,8 +73,9 @@ async def crawl_venues():
                 CSS_SELECTOR,
                 llm_strategy,
                 session_id,
-                REQUIRED_KEYS,
+                required_keys,
                 seen_names,
+                single_render=SINGLE_RENDER,
             )
 
             if no_results_found:
@@ -58,9 +90,186 @@ async def crawl_venues():
             all_venues.extend(venues)
             page_number += 1  # Move to the next page
 
-            # Pause between requests to be polite and avoid rate limits
-            await asyncio.sleep(2)  # Adjust sleep time as needed
+    print(f"Rate limiter waits: {rate_limiter.summary()}")
+    save_and_report(all_venues, llm_strategy)
+
+
+async def crawl_venues_pipelined(lookahead: int):
+    """
+    Crawls venue data with rendering overlapped with LLM extraction.
+
+    While page N goes through the LLM, pages N+1..N+lookahead are already
+    being rendered, each in its own browser session. Pages are still
+    processed strictly in order, so the duplicate check on ``seen_names``
+    behaves exactly as in the serial crawl.
+
+    Args:
+        lookahead (int): Number of pages rendered ahead of the page being extracted.
+    """
+    browser_config = get_browser_config()
+    session_id = "venue_crawl_session"
+    rate_limiter = HostRateLimiter()
+
+    all_venues = []
+    seen_names = set()
+    pages_done = 0
+    started = time.perf_counter()
+
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+        # Politeness comes from the per-host budget in crawl_common.rate_limit
+        rate_limiter.attach(crawler)
+        llm_strategy, required_keys = await get_extraction_strategy(
+            crawler, BASE_URL, CSS_SELECTOR, session_id, REQUIRED_KEYS,
+            mode=EXTRACTION_MODE, sample_pages=SCHEMA_SAMPLE_PAGES,
+            llm_only_keys=LLM_ONLY_KEYS,
+        )
+
+        async def timed_render(page_number: int):
+            # One session per in-flight slot so concurrent renders never share a tab
+            slot_session = f"{session_id}_{page_number % (lookahead + 1)}"
+            start = time.perf_counter()
+            page = await render_page(
+                crawler, f"{BASE_URL}?page={page_number}", slot_session
+            )
+            return page, time.perf_counter() - start
+
+        pending = deque()
+        next_page = 1
+
+        def schedule_next():
+            nonlocal next_page
+            print(f"Loading page {next_page}...")
+            pending.append((next_page, asyncio.create_task(timed_render(next_page))))
+            next_page += 1
+
+        for _ in range(lookahead + 1):
+            schedule_next()
+
+        try:
+            while pending:
+                page_number, render_task = pending.popleft()
+                page, render_seconds = await render_task
+
+                # Keep the lookahead window full while this page is extracted
+                schedule_next()
+
+                timings = new_page_timings()
+                timings["render"] = render_seconds
+                timings["fetches"] = 1
+                venues, no_results_found = await process_rendered_page(
+                    crawler,
+                    page,
+                    page_number,
+                    CSS_SELECTOR,
+                    llm_strategy,
+                    required_keys,
+                    seen_names,
+                    timings,
+                )
+                pages_done += 1
+
+                if no_results_found:
+                    print("No more venues found. Ending crawl.")
+                    break
+
+                if not venues:
+                    print(f"No venues extracted from page {page_number}.")
+                    break
+
+                all_venues.extend(venues)
+        finally:
+            # Drop the renders that were started past the last page
+            for _, render_task in pending:
+                render_task.cancel()
+            await asyncio.gather(
+                *(render_task for _, render_task in pending), return_exceptions=True
+            )
+
+    elapsed_minutes = (time.perf_counter() - started) / 60
+    if elapsed_minutes > 0:
+        print(
+            f"Processed {pages_done} pages in {elapsed_minutes:.2f} min "
+            f"({pages_done / elapsed_minutes:.1f} pages/min, lookahead={lookahead})."
+        )
 
+    print(f"Rate limiter waits: {rate_limiter.summary()}")
+    save_and_report(all_venues, llm_strategy)
+
+
+async def crawl_venues_planned(concurrency: int):
+    """
+    Crawls venue data by planning the page range first.
+
+    The last page is located with exponential probing and binary search on
+    the "No Results Found" signal, then every page is dispatched to a bounded
+    pool of concurrent browser sessions in one parallel wave. If a probe keeps
+    failing, the boundary is unknown and the serial walk is used instead.
+
+    Args:
+        concurrency (int): Number of concurrent browser sessions.
+    """
+    browser_config = get_browser_config()
+    session_id = "venue_crawl_session"
+    rate_limiter = HostRateLimiter()
+
+    seen_names = set()
+    probes = {}
+    started = time.perf_counter()
+
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+        # Politeness comes from the per-host budget in crawl_common.rate_limit
+        rate_limiter.attach(crawler)
+        llm_strategy, required_keys = await get_extraction_strategy(
+            crawler, BASE_URL, CSS_SELECTOR, session_id, REQUIRED_KEYS,
+            mode=EXTRACTION_MODE, sample_pages=SCHEMA_SAMPLE_PAGES,
+            llm_only_keys=LLM_ONLY_KEYS,
+        )
+        try:
+            last_page = await find_last_page(crawler, BASE_URL, session_id, probes)
+        except ProbeError as e:
+            print(f"⚠️ {e}. Falling back to the serial crawl.")
+            last_page = None
+        if last_page is None:
+            all_venues = []
+        elif last_page == 0:
+            print("No more venues found. Ending crawl.")
+            all_venues = []
+        else:
+            all_venues = await crawl_page_range(
+                crawler,
+                last_page,
+                BASE_URL,
+                CSS_SELECTOR,
+                llm_strategy,
+                session_id,
+                required_keys,
+                seen_names,
+                probes,
+                concurrency,
+            )
+
+    elapsed_minutes = (time.perf_counter() - started) / 60
+    if last_page and elapsed_minutes > 0:
+        print(
+            f"Processed {last_page} pages in {elapsed_minutes:.2f} min "
+            f"({last_page / elapsed_minutes:.1f} pages/min, concurrency={concurrency})."
+        )
+
+    print(f"Rate limiter waits: {rate_limiter.summary()}")
+    if last_page is None:
+        await crawl_venues()
+        return
+    save_and_report(all_venues, llm_strategy)
+
+
+def save_and_report(all_venues: list, llm_strategy):
+    """
+    Saves the collected venues and shows the LLM usage statistics.
+
+    Args:
+        all_venues (list): The venues collected during the crawl.
+        llm_strategy (ExtractionStrategy): The strategy used for extraction.
+    """
     # Save the collected venues to a CSV file
     if all_venues:
         save_venues_to_csv(all_venues, "complete_venues.csv")
@@ -68,15 +277,21 @@ async def crawl_venues():
     else:
         print("No venues were found during the crawl.")
 
-    # Display usage statistics for the LLM strategy
-    llm_strategy.show_usage()
+    # Display usage statistics for the LLM strategy (schema extraction makes no LLM calls)
+    if hasattr(llm_strategy, "show_usage"):
+        llm_strategy.show_usage()
 
 
 async def main():
     """
     Entry point of the script.
     """
-    await crawl_venues()
+    if CRAWL_MODE == "planned":
+        await crawl_venues_planned(PAGE_RANGE_CONCURRENCY)
+    elif CRAWL_MODE == "pipelined":
+        await crawl_venues_pipelined(PIPELINE_LOOKAHEAD)
+    else:
+        await crawl_venues()
 
 
 if __name__ == "__main__":
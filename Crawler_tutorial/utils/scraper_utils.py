@@ -1,12 +1,16 @@
+import asyncio
 import json
 import os
-from typing import List, Set, Tuple
+import time
+from typing import Dict, List, Set, Tuple
 
+from bs4 import BeautifulSoup
 from crawl4ai import (
     AsyncWebCrawler,
     BrowserConfig,
     CacheMode,
     CrawlerRunConfig,
+    JsonCssExtractionStrategy,
     LLMExtractionStrategy,
 )
 
@@ -52,6 +56,78 @@ def get_llm_strategy() -> LLMExtractionStrategy:
     )
 
 
+async def get_extraction_strategy(
+    crawler: AsyncWebCrawler,
+    base_url: str,
+    css_selector: str,
+    session_id: str,
+    required_keys: List[str],
+    mode: str = "llm",
+    sample_pages: int = 4,
+    llm_only_keys: List[str] = (),
+) -> Tuple[object, List[str]]:
+    """
+    Returns the extraction strategy for the crawl.
+
+    With ``mode="schema"`` the LLM is only used to induce a CSS schema from
+    the first ``sample_pages`` listing pages, validated on half of them and
+    cached in ``.schema_cache/theknot.json``. Every page is then extracted
+    with ``JsonCssExtractionStrategy`` and no LLM calls. The schema can only
+    extract what is in the card markup, so ``llm_only_keys`` are left out of
+    its validation and of the keys venues must have. If no schema validates,
+    the crawl falls back to LLM extraction.
+
+    Args:
+        crawler (AsyncWebCrawler): The web crawler instance.
+        base_url (str): The base URL of the website.
+        css_selector (str): The CSS selector to target the content.
+        session_id (str): The session identifier.
+        required_keys (List[str]): Fields every venue must have.
+        mode (str): ``"llm"`` or ``"schema"``.
+        sample_pages (int): Listing pages rendered to induce and validate the schema.
+        llm_only_keys (List[str]): Required keys only the LLM can produce.
+
+    Returns:
+        Tuple[ExtractionStrategy, List[str]]: The strategy passed to every
+        page extraction, and the keys its venues must have.
+    """
+    if mode != "schema":
+        return get_llm_strategy(), required_keys
+
+    card_keys = [key for key in required_keys if key not in llm_only_keys]
+
+    from crawl_common.schema_induction import SchemaStore
+
+    samples = []
+    for page_number in range(1, sample_pages + 1):
+        page = await render_page(crawler, f"{base_url}?page={page_number}", session_id)
+        if page.success:
+            soup = BeautifulSoup(page.html, "html.parser")
+            venues = "".join(str(element) for element in soup.select(css_selector))
+            if venues:
+                samples.append(f"<div>{venues}</div>")
+
+    try:
+        schema = await SchemaStore().get(
+            "theknot",
+            samples,
+            card_keys,
+            query=(
+                "Each element is one wedding venue card. Extract "
+                f"{', '.join(card_keys)}."
+            ),
+            target_json_example=json.dumps(
+                {key: "..." for key in Venue.model_fields if key not in llm_only_keys}
+            ),
+            provider="groq/deepseek-r1-distill-llama-70b",
+            api_token=os.getenv("GROQ_API_KEY"),
+        )
+    except ValueError as e:
+        print(f"⚠️ {e}. Falling back to LLM extraction.")
+        return get_llm_strategy(), required_keys
+    return JsonCssExtractionStrategy(schema), card_keys
+
+
 async def check_no_results(
     crawler: AsyncWebCrawler,
     url: str,
@@ -88,6 +164,197 @@ async def check_no_results(
     return False
 
 
+async def render_page(
+    crawler: AsyncWebCrawler,
+    url: str,
+    session_id: str,
+):
+    """
+    Renders a page once in the browser without any extraction strategy.
+
+    Args:
+        crawler (AsyncWebCrawler): The web crawler instance.
+        url (str): The URL to render.
+        session_id (str): The session identifier.
+
+    Returns:
+        CrawlResult: The result of the single browser fetch.
+    """
+    return await crawler.arun(
+        url=url,
+        config=CrawlerRunConfig(
+            cache_mode=CacheMode.BYPASS,  # Do not use cached data
+            session_id=session_id,  # Unique session ID for the crawl
+        ),
+    )
+
+
+async def extract_from_html(
+    crawler: AsyncWebCrawler,
+    html: str,
+    css_selector: str,
+    llm_strategy: LLMExtractionStrategy,
+):
+    """
+    Runs the CSS-selected LLM extraction on already rendered HTML.
+
+    The HTML is passed to the crawler as a ``raw:`` URL, so no browser
+    navigation happens; only the content scraping and the LLM call run.
+
+    Args:
+        crawler (AsyncWebCrawler): The web crawler instance.
+        html (str): The rendered HTML of the page.
+        css_selector (str): The CSS selector to target the content.
+        llm_strategy (LLMExtractionStrategy): The LLM extraction strategy.
+
+    Returns:
+        CrawlResult: The result holding the extracted content.
+    """
+    return await crawler.arun(
+        url=f"raw:{html}",
+        config=CrawlerRunConfig(
+            cache_mode=CacheMode.BYPASS,
+            extraction_strategy=llm_strategy,  # Strategy for data extraction
+            css_selector=css_selector,  # Target specific content on the page
+        ),
+    )
+
+
+def new_page_timings() -> dict:
+    """
+    Returns an empty per-page timing breakdown.
+
+    Returns:
+        dict: Seconds per stage (render, no-results check, extraction) and the
+        number of browser fetches.
+    """
+    return {"render": 0.0, "no_results_check": 0.0, "extraction": 0.0, "fetches": 0}
+
+
+def print_page_timings(page_number: int, timings: dict):
+    """
+    Prints the per-page timing breakdown.
+
+    Args:
+        page_number (int): The page number the timings belong to.
+        timings (dict): Seconds spent per stage plus the number of browser fetches.
+    """
+    stages = ", ".join(
+        f"{stage}={seconds:.2f}s"
+        for stage, seconds in timings.items()
+        if stage != "fetches"
+    )
+    print(f"Page {page_number} timings: {stages} (browser fetches: {timings['fetches']})")
+
+
+def process_extracted_venues(
+    result,
+    page_number: int,
+    required_keys: List[str],
+    seen_names: Set[str],
+) -> List[dict]:
+    """
+    Parses the LLM output of a page and keeps the complete, unseen venues.
+
+    Args:
+        result (CrawlResult): The crawl result holding the extracted content.
+        page_number (int): The page number the result belongs to.
+        required_keys (List[str]): List of required keys in the venue data.
+        seen_names (Set[str]): Set of venue names that have already been seen.
+
+    Returns:
+        List[dict]: A list of processed venues from the page.
+    """
+    if not (result.success and result.extracted_content):
+        print(f"Error fetching page {page_number}: {result.error_message}")
+        return []
+
+    # Parse extracted content
+    extracted_data = json.loads(result.extracted_content)
+    if not extracted_data:
+        print(f"No venues found on page {page_number}.")
+        return []
+
+    # After parsing extracted content
+    print("Extracted data:", extracted_data)
+
+    # Process venues
+    complete_venues = []
+    for venue in extracted_data:
+        # Debugging: Print each venue to understand its structure
+        print("Processing venue:", venue)
+
+        # Ignore the 'error' key if it's False
+        if venue.get("error") is False:
+            venue.pop("error", None)  # Remove the 'error' key if it's False
+
+        if not is_complete_venue(venue, required_keys):
+            continue  # Skip incomplete venues
+
+        if is_duplicate_venue(venue["name"], seen_names):
+            print(f"Duplicate venue '{venue['name']}' found. Skipping.")
+            continue  # Skip duplicate venues
+
+        # Add venue to the list
+        seen_names.add(venue["name"])
+        complete_venues.append(venue)
+
+    if not complete_venues:
+        print(f"No complete venues found on page {page_number}.")
+        return []
+
+    print(f"Extracted {len(complete_venues)} venues from page {page_number}.")
+    return complete_venues
+
+
+async def process_rendered_page(
+    crawler: AsyncWebCrawler,
+    page,
+    page_number: int,
+    css_selector: str,
+    llm_strategy: LLMExtractionStrategy,
+    required_keys: List[str],
+    seen_names: Set[str],
+    timings: dict,
+) -> Tuple[List[dict], bool]:
+    """
+    Runs the "No Results Found" check and the LLM extraction on a rendered page.
+
+    Args:
+        crawler (AsyncWebCrawler): The web crawler instance.
+        page (CrawlResult): The result of rendering the page.
+        page_number (int): The page number of the rendered page.
+        css_selector (str): The CSS selector to target the content.
+        llm_strategy (LLMExtractionStrategy): The LLM extraction strategy.
+        required_keys (List[str]): List of required keys in the venue data.
+        seen_names (Set[str]): Set of venue names that have already been seen.
+        timings (dict): Per-page timing breakdown, updated in place.
+
+    Returns:
+        Tuple[List[dict], bool]:
+            - List[dict]: A list of processed venues from the page.
+            - bool: A flag indicating if the "No Results Found" message was encountered.
+    """
+    if not page.success:
+        print(f"Error fetching page {page_number}: {page.error_message}")
+        print_page_timings(page_number, timings)
+        return [], False
+
+    start = time.perf_counter()
+    no_results = "No Results Found" in page.cleaned_html
+    timings["no_results_check"] = time.perf_counter() - start
+    if no_results:
+        print_page_timings(page_number, timings)
+        return [], True  # No more results, signal to stop crawling
+
+    start = time.perf_counter()
+    result = await extract_from_html(crawler, page.html, css_selector, llm_strategy)
+    timings["extraction"] = time.perf_counter() - start
+    print_page_timings(page_number, timings)
+
+    return process_extracted_venues(result, page_number, required_keys, seen_names), False
+
+
 async def fetch_and_process_page(
     crawler: AsyncWebCrawler,
     page_number: int,
@@ -97,10 +364,15 @@ async def fetch_and_process_page(
     session_id: str,
     required_keys: List[str],
     seen_names: Set[str],
+    single_render: bool = True,
 ) -> Tuple[List[dict], bool]:
     """
     Fetches and processes a single page of venue data.
 
+    In single-render mode the page is rendered once; the "No Results Found"
+    check and the LLM extraction both run on that one result. Otherwise the
+    page is fetched twice, once for the check and once for the extraction.
+
     Args:
         crawler (AsyncWebCrawler): The web crawler instance.
         page_number (int): The page number to fetch.
@@ -110,6 +382,7 @@ async def fetch_and_process_page(
         session_id (str): The session identifier.
         required_keys (List[str]): List of required keys in the venue data.
         seen_names (Set[str]): Set of venue names that have already been seen.
+        single_render (bool): Whether to render the page only once.
 
     Returns:
         Tuple[List[dict], bool]:
@@ -118,13 +391,37 @@ async def fetch_and_process_page(
     """
     url = f"{base_url}?page={page_number}"
     print(f"Loading page {page_number}...")
+    timings = new_page_timings()
+
+    if single_render:
+        # Render the page once and reuse the result for both steps
+        start = time.perf_counter()
+        page = await render_page(crawler, url, session_id)
+        timings["render"] = time.perf_counter() - start
+        timings["fetches"] += 1
+
+        return await process_rendered_page(
+            crawler,
+            page,
+            page_number,
+            css_selector,
+            llm_strategy,
+            required_keys,
+            seen_names,
+            timings,
+        )
 
     # Check if "No Results Found" message is present
+    start = time.perf_counter()
     no_results = await check_no_results(crawler, url, session_id)
+    timings["no_results_check"] = time.perf_counter() - start
+    timings["fetches"] += 1
     if no_results:
+        print_page_timings(page_number, timings)
         return [], True  # No more results, signal to stop crawling
 
     # Fetch page content with the extraction strategy
+    start = time.perf_counter()
     result = await crawler.arun(
         url=url,
         config=CrawlerRunConfig(
@@ -134,44 +431,196 @@ async def fetch_and_process_page(
             session_id=session_id,  # Unique session ID for the crawl
         ),
     )
+    timings["extraction"] = time.perf_counter() - start
+    timings["fetches"] += 1
+    print_page_timings(page_number, timings)
 
-    if not (result.success and result.extracted_content):
-        print(f"Error fetching page {page_number}: {result.error_message}")
-        return [], False
+    return process_extracted_venues(result, page_number, required_keys, seen_names), False
 
-    # Parse extracted content
-    extracted_data = json.loads(result.extracted_content)
-    if not extracted_data:
-        print(f"No venues found on page {page_number}.")
-        return [], False
 
-    # After parsing extracted content
-    print("Extracted data:", extracted_data)
+class ProbeError(Exception):
+    """A probe render kept failing, so the page range cannot be trusted."""
 
-    # Process venues
-    complete_venues = []
-    for venue in extracted_data:
-        # Debugging: Print each venue to understand its structure
-        print("Processing venue:", venue)
 
-        # Ignore the 'error' key if it's False
-        if venue.get("error") is False:
-            venue.pop("error", None)  # Remove the 'error' key if it's False
+async def probe_page(
+    crawler: AsyncWebCrawler,
+    page_number: int,
+    base_url: str,
+    session_id: str,
+    probes: Dict[int, object],
+    retries: int = 3,
+) -> bool:
+    """
+    Renders a listing page and reports whether it still has results.
 
-        if not is_complete_venue(venue, required_keys):
-            continue  # Skip incomplete venues
+    Pages that have results are kept in ``probes`` so they do not need to be
+    rendered again when the page range is crawled. A failed render is not an
+    empty page: it is retried with backoff, and only a rendered "No Results
+    Found" page counts as the end of the listing.
 
-        if is_duplicate_venue(venue["name"], seen_names):
-            print(f"Duplicate venue '{venue['name']}' found. Skipping.")
-            continue  # Skip duplicate venues
+    Args:
+        crawler (AsyncWebCrawler): The web crawler instance.
+        page_number (int): The page number to probe.
+        base_url (str): The base URL of the website.
+        session_id (str): The session identifier.
+        probes (Dict[int, CrawlResult]): Rendered pages with results, by page number.
+        retries (int): Renders to retry after the first one fails.
 
-        # Add venue to the list
-        seen_names.add(venue["name"])
-        complete_venues.append(venue)
+    Returns:
+        bool: True if the page has results, False if it shows "No Results Found".
 
-    if not complete_venues:
-        print(f"No complete venues found on page {page_number}.")
-        return [], False
+    Raises:
+        ProbeError: If every render of the page failed.
+    """
+    for attempt in range(retries + 1):
+        print(f"Probing page {page_number}...")
+        page = await render_page(crawler, f"{base_url}?page={page_number}", session_id)
+        if page.success:
+            break
+        print(f"Error probing page {page_number} (attempt {attempt + 1}/{retries + 1}): {page.error_message}")
+        if attempt < retries:
+            await asyncio.sleep(2 ** attempt)
+    else:
+        raise ProbeError(f"Page {page_number} failed to render {retries + 1} times: {page.error_message}")
+    if "No Results Found" in page.cleaned_html:
+        return False
+    probes[page_number] = page
+    return True
 
-    print(f"Extracted {len(complete_venues)} venues from page {page_number}.")
-    return complete_venues, False  # Continue crawling
+
+async def find_last_page(
+    crawler: AsyncWebCrawler,
+    base_url: str,
+    session_id: str,
+    probes: Dict[int, object],
+    max_pages: int = 1024,
+) -> int:
+    """
+    Finds the last listing page using the "No Results Found" signal.
+
+    Pages 1, 2, 4, 8, ... are probed until one has no results, then the last
+    page is located by binary search between the last good and first empty
+    probe. A listing with 40 pages takes about a dozen probes instead of 41
+    serial round trips.
+
+    Args:
+        crawler (AsyncWebCrawler): The web crawler instance.
+        base_url (str): The base URL of the website.
+        session_id (str): The session identifier.
+        probes (Dict[int, CrawlResult]): Rendered pages with results, filled while probing.
+        max_pages (int): Upper bound on the number of pages to consider.
+
+    Returns:
+        int: The number of the last page with results, or 0 if there is none.
+
+    Raises:
+        ProbeError: If a probe kept failing, so the boundary is unknown.
+    """
+    probe_count = 0
+
+    async def has_results(page_number: int) -> bool:
+        nonlocal probe_count
+        probe_count += 1
+        return await probe_page(crawler, page_number, base_url, session_id, probes)
+
+    # Exponential probing for an upper bound
+    last_good, first_empty = 0, 1
+    while first_empty <= max_pages and await has_results(first_empty):
+        last_good, first_empty = first_empty, first_empty * 2
+
+    if first_empty > max_pages:
+        first_empty = max_pages + 1
+
+    # Binary search for the boundary
+    while first_empty - last_good > 1:
+        middle = (last_good + first_empty) // 2
+        if await has_results(middle):
+            last_good = middle
+        else:
+            first_empty = middle
+
+    print(f"Last page is {last_good} (found with {probe_count} probes).")
+    return last_good
+
+
+async def crawl_page_range(
+    crawler: AsyncWebCrawler,
+    last_page: int,
+    base_url: str,
+    css_selector: str,
+    llm_strategy: LLMExtractionStrategy,
+    session_id: str,
+    required_keys: List[str],
+    seen_names: Set[str],
+    probes: Dict[int, object],
+    concurrency: int,
+) -> List[dict]:
+    """
+    Renders and extracts pages 1..last_page with a bounded pool of sessions.
+
+    Each worker owns one browser session and pulls page numbers from a shared
+    queue; pages already rendered while probing are only extracted. Venues are
+    filtered in page order once all pages are done, so duplicates are dropped
+    exactly as in the serial crawl.
+
+    Args:
+        crawler (AsyncWebCrawler): The web crawler instance.
+        last_page (int): The last page with results.
+        base_url (str): The base URL of the website.
+        css_selector (str): The CSS selector to target the content.
+        llm_strategy (LLMExtractionStrategy): The LLM extraction strategy.
+        session_id (str): The session identifier, suffixed per worker.
+        required_keys (List[str]): List of required keys in the venue data.
+        seen_names (Set[str]): Set of venue names that have already been seen.
+        probes (Dict[int, CrawlResult]): Rendered pages kept from probing.
+        concurrency (int): Number of concurrent browser sessions.
+
+    Returns:
+        List[dict]: The complete, unique venues of all pages in page order.
+    """
+    queue = asyncio.Queue()
+    for page_number in range(1, last_page + 1):
+        queue.put_nowait(page_number)
+    extracted = {}
+
+    async def worker(worker_id: int):
+        worker_session = f"{session_id}_{worker_id}"
+        while True:
+            try:
+                page_number = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            timings = new_page_timings()
+            page = probes.pop(page_number, None)
+            if page is None:
+                start = time.perf_counter()
+                page = await render_page(
+                    crawler, f"{base_url}?page={page_number}", worker_session
+                )
+                timings["render"] = time.perf_counter() - start
+                timings["fetches"] += 1
+
+            if not page.success:
+                print(f"Error fetching page {page_number}: {page.error_message}")
+                extracted[page_number] = page
+                print_page_timings(page_number, timings)
+                continue
+
+            start = time.perf_counter()
+            extracted[page_number] = await extract_from_html(
+                crawler, page.html, css_selector, llm_strategy
+            )
+            timings["extraction"] = time.perf_counter() - start
+            print_page_timings(page_number, timings)
+
+    await asyncio.gather(*(worker(i) for i in range(max(1, concurrency))))
+
+    all_venues = []
+    for page_number in range(1, last_page + 1):
+        all_venues.extend(
+            process_extracted_venues(
+                extracted[page_number], page_number, required_keys, seen_names
+            )
+        )
+    return all_venues
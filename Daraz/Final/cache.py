@@ -0,0 +1,159 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import zstandard
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.dedup import canonical_url
+
+
+class HtmlCache:
+    """
+    Persistent cache of rendered HTML.
+
+    Pages are keyed by canonical URL; the HTML itself is stored once per
+    content hash as a zstd-compressed file, so identical pages reached through
+    different URLs share one blob. Entries expire after `ttl` seconds and the
+    least recently used ones are evicted once the blobs exceed `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=".html_cache", ttl=7 * 24 * 3600, max_bytes=2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"))
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                source_url TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            """
+        )
+        self.compressor = zstandard.ZstdCompressor(level=10)
+        self.decompressor = zstandard.ZstdDecompressor()
+
+    def _blob_path(self, content_hash):
+        return os.path.join(self.cache_dir, "objects", content_hash[:2], content_hash + ".html.zst")
+
+    def get(self, url):
+        """Returns the cached HTML for `url`, or None if missing or expired."""
+        key = canonical_url(url)
+        row = self.db.execute(
+            "SELECT content_hash, fetched_at FROM pages WHERE url = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+
+        try:
+            with open(self._blob_path(row[0]), "rb") as f:
+                html = self.decompressor.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            self.db.execute("DELETE FROM pages WHERE url = ?", (key,))
+            self.db.commit()
+            self.misses += 1
+            return None
+
+        self.db.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), key))
+        self.db.commit()
+        self.hits += 1
+        return html
+
+    def put(self, url, html):
+        """Stores the rendered HTML of `url` and evicts old entries if needed."""
+        data = html.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(content_hash)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = self.compressor.compress(data)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+            self.db.execute(
+                "INSERT OR REPLACE INTO blobs (content_hash, size) VALUES (?, ?)",
+                (content_hash, len(compressed)),
+            )
+
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages (url, source_url, content_hash, fetched_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (canonical_url(url), url, content_hash, now, now),
+        )
+        self.db.commit()
+        self.evict()
+
+    def entries(self):
+        """Yields (source_url, html) for every fresh entry, oldest fetch first."""
+        rows = self.db.execute(
+            "SELECT source_url FROM pages WHERE fetched_at >= ? ORDER BY fetched_at",
+            (time.time() - self.ttl,),
+        ).fetchall()
+        for (source_url,) in rows:
+            html = self.get(source_url)
+            if html is not None:
+                yield source_url, html
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones above `max_bytes`."""
+        self.db.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - self.ttl,))
+
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total > self.max_bytes:
+            lru = self.db.execute(
+                "SELECT url, content_hash FROM pages ORDER BY accessed_at"
+            ).fetchall()
+            for url, content_hash in lru:
+                if total <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                shared = self.db.execute(
+                    "SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (content_hash,)
+                ).fetchone()
+                if not shared:
+                    total -= self._drop_blob(content_hash)
+
+        # Blobs no page points to any more (expired above)
+        orphans = self.db.execute(
+            "SELECT content_hash FROM blobs WHERE content_hash NOT IN (SELECT content_hash FROM pages)"
+        ).fetchall()
+        for (content_hash,) in orphans:
+            self._drop_blob(content_hash)
+        self.db.commit()
+
+    def _drop_blob(self, content_hash):
+        size = self.db.execute(
+            "SELECT size FROM blobs WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        self.db.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+        try:
+            os.remove(self._blob_path(content_hash))
+        except FileNotFoundError:
+            pass
+        return size[0] if size else 0
+
+    def stats(self):
+        pages = self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        blobs, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {"pages": pages, "blobs": blobs, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self.db.close()
@@ -4,10 +4,87 @@ from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig, CacheMode
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
 from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
 import re
-from bs4 import BeautifulSoup
 from crawl4ai.deep_crawling.filters import FilterChain, URLPatternFilter
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.readiness import SITE_READY_SELECTORS, format_readiness, readiness_wait
+from crawl_common.scroll import adaptive_scroll_js, format_scroll
+from crawl_common.blocking import ResourceBlocker, format_blocking
+from crawl_common.rate_limit import HostRateLimiter
+from crawl_common.records import RECORDS_FILE, RecordWriter
+from crawl_common.fragments import select_fragments
+from cache import HtmlCache
 
-async def crawlScrap():
+
+def extract_products(html, url):
+    """
+    Return the <div class='Ms6aG'> product cards of a page as HTML strings.
+
+    The cards are written out while the page is tokenized, without building
+    a tree of the whole page; the strings equal str(div) of a full parse.
+    """
+    divs = select_fragments(html, "div.Ms6aG")
+    if not divs:
+        print(f"⚠️ No <div class='Ms6aG'> found in {url}")
+    return divs
+
+
+def write_page(records, f, i, url, html):
+    """Append one page's URL and product card records to the open output files."""
+    if url:
+        print(f"✅ [{i}] Found: {url} ({format_readiness(html)}; {format_scroll(html)}; {format_blocking(html)})")
+        f.write(url + "\n")
+    if html:
+        for card, card_html in enumerate(extract_products(html, url)):
+            records.write(url, card, card_html)
+
+
+def write_pages(pages):
+    """Write (url, html) pairs to 'filtered_urls.txt' and RECORDS_FILE."""
+    with RecordWriter(RECORDS_FILE) as records, open("filtered_urls.txt", "w", encoding="utf-8") as f:
+        for i, (url, html) in enumerate(pages, start=1):
+            write_page(records, f, i, url, html)
+        print(f"🧾 Wrote {records.count} product records to {RECORDS_FILE}")
+
+
+def scrapFromCache(cache_dir=".html_cache"):
+    """Re-run the product extraction on cached HTML without opening a browser."""
+    cache = HtmlCache(cache_dir)
+    write_pages(cache.entries())
+    print(f"✅ Re-extracted from cache: {cache.stats()}")
+    cache.close()
+
+
+async def crawlStream(crawler, url, run_config, cache_dir):
+    """
+    Consume deep-crawl results as the BFS strategy yields them.
+
+    Each page is cached, its product cards are extracted and both output
+    files are flushed before the next result is awaited, so the rendered
+    HTML of a page is released right away instead of being held until the
+    whole crawl finishes.
+    """
+    cache = HtmlCache(cache_dir)
+    total = 0
+    with RecordWriter(RECORDS_FILE) as records, open("filtered_urls.txt", "w", encoding="utf-8") as f:
+        async for result in await crawler.arun(url=url, config=run_config):
+            total += 1
+            page_url, html = getattr(result, "url", None), getattr(result, "html", None)
+            if page_url and html:
+                cache.put(page_url, html)
+            write_page(records, f, total, page_url, html)
+            records.flush()
+            f.flush()
+            del result, html
+        print(f"🧾 Wrote {records.count} product records to {RECORDS_FILE}")
+
+    print(f"💾 HTML cache: {cache.stats()}")
+    cache.close()
+    return total
+
+
+async def crawlScrap(cache_dir=".html_cache", stream=True, block_resources=False):
     browser_config = BrowserConfig(verbose=True)
     # url_filter = URLPatternFilter(
     #     patterns=["*/catalog/*"]
@@ -48,18 +125,12 @@ async def crawlScrap():
         #                     BROWSER TIMING & DYNAMIC RENDERING
         # ==============================================================================
         # page_timeout = 30,                        # Maximum time (in seconds) to wait for the page to load.
-        delay_before_return_html = 5.0,            # Time (in seconds) to wait *after* the page is considered loaded and JS is executed.
-        mean_delay = 2.0,                          # Average random delay (in seconds) between requests to simulate human behavior.
-        max_range = 6.0,                           # The maximum variation (randomness) for the delay calculation.
+        wait_for = readiness_wait(SITE_READY_SELECTORS["daraz"]),  # Ready once product cards stop appearing, or the network goes idle (max 20s).
+        wait_for_timeout = 25000,                  # Safety net (ms) above the readiness cap.
+        delay_before_return_html = 0.5,            # Time (in seconds) to wait *after* the page is considered loaded and JS is executed.
         semaphore_count = 5,                       # Limits the number of concurrent URLs scraped at once.
-        js_code = """
-            // Scroll to bottom to trigger lazy loading
-            window.scrollTo(0, document.body.scrollHeight); 
-            return true;
-        """,
-        scan_full_page = True,                    # If True, ensures the browser has rendered the full document height.
-        scroll_delay = 1.5,                        # Time (in seconds) to wait between individual scroll steps.
-        max_scroll_steps = 10,                   # Limits the number of times the page will automatically scroll down.
+        js_code = adaptive_scroll_js(SITE_READY_SELECTORS["daraz"]),  # Scroll until the number of product cards stops growing.
+        scan_full_page = False,                    # The adaptive scroll above replaces the fixed full-page scan.
         process_iframes = False,                   # If True, content will be extracted from embedded IFRAMEs.
         remove_overlay_elements = True,           # Attempts to hide or remove sticky headers, consent popups, etc.
         simulate_user = True,                     # Enables aggressive user behavior simulation (e.g., random mouse movements).
@@ -80,6 +151,7 @@ async def crawlScrap():
             include_external=False,
             # filter_chain=FilterChain([url_filter])
         ),  
+        stream = stream,                           # If True, results are yielded one by one as pages finish instead of returned as a list.
         # url_matcher = r"daraz\.com\.np/catalog",                        # Custom object to filter URLs based on a pattern/logic.
 
         # ==============================================================================
@@ -92,7 +164,26 @@ async def crawlScrap():
         experimental = {},                         # Dictionary for passing experimental or undocumented parameters.
     )
 
+    rate_limiter = HostRateLimiter()
     async with AsyncWebCrawler() as crawler:
+        rate_limiter.attach(crawler)               # Per-host request budget (crawl_common.rate_limit) instead of mean_delay jitter.
+        if block_resources:
+            # Listing pages only need the card DOM: skip images, fonts, media and trackers
+            blocker = ResourceBlocker.for_site("daraz")
+            blocker.attach(crawler)
+
+        if stream:
+            total = await crawlStream(crawler, "https://www.daraz.com.np/", run_config, cache_dir)
+            print(f"⏳ Rate limiter waits: {rate_limiter.summary()}")
+            if block_resources:
+                print(f"🚫 Blocked {blocker.totals['requests']} requests (~{blocker.totals['bytes'] / 1e6:.1f} MB est.)")
+            if total:
+                print(f"✅ Total pages crawled: {total}")
+                print(f"✅ Crawl complete. Results saved to 'filtered_urls.txt' and '{RECORDS_FILE}'.")
+            else:
+                print("❌ Crawl failed or returned no results.")
+            return
+
         results = await crawler.arun(
             url="https://www.daraz.com.np/",
             config=run_config,
@@ -103,25 +194,17 @@ async def crawlScrap():
             total = len(results)
             print(f"✅ Total pages crawled: {total}")
 
-            with open("markdown.md", "w", encoding="utf-8") as m, open("filtered_urls.txt", "w", encoding="utf-8") as f:
-                for i, result in enumerate(results, start=1):
-                    if hasattr(result, "url") and result.url:
-                        print(f"✅ [{i}/{total}] Found: {result.url}")
-                        f.write(result.url + "\n")
-                    if hasattr(result, "html") and result.html:
-                        html = result.html
-                        soup = BeautifulSoup(html, "html.parser")
-                        divs = soup.find_all("div", class_="Ms6aG")
-
-                        content = ""
-                        if divs:
-                            for div in divs:
-                                content += str(div) + "\n\n"
-                        else:
-                            print(f"⚠️ No <div class='Ms6aG'> found in {result.url}")
-                        m.write(content + "\n\n---\n\n")
-
-            print("✅ Crawl complete. Results saved to 'filtered_urls.txt' and 'markdown.md'.")
+            # Keep the rendered HTML so extraction can be re-run without a re-crawl
+            cache = HtmlCache(cache_dir)
+            for result in results:
+                if getattr(result, "url", None) and getattr(result, "html", None):
+                    cache.put(result.url, result.html)
+            print(f"💾 HTML cache: {cache.stats()}")
+            cache.close()
+
+            write_pages((getattr(r, "url", None), getattr(r, "html", None)) for r in results)
+
+            print(f"✅ Crawl complete. Results saved to 'filtered_urls.txt' and '{RECORDS_FILE}'.")
 
         else:
             print("❌ Crawl failed or returned no results.")
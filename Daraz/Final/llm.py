@@ -1,11 +1,25 @@
 import os
 import json
+import asyncio
+from collections import Counter
+import sys
+from functools import partial
+from itertools import islice
+from pathlib import Path
 from bs4 import BeautifulSoup
 from google import genai
 from google.genai import types  # for config types etc
-from markdownify import markdownify as md
 from typing import List, Optional
 from dotenv import load_dotenv
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.llm_scheduler import QuotaScheduler
+from crawl_common.llm_json import response_tokens, salvage_json_array
+from crawl_common.llm_cache import LLMCache
+from crawl_common.tokens import TokenCounter, pack_records
+from crawl_common.compact import UrlTable
+from crawl_common.preprocess import format_cpu_stats, parallel_map, prepare_record
+from crawl_common.dedup import DedupIndex, dedup_records
+from crawl_common.records import RECORDS_FILE, iter_records
 # Load environment variables from .env file
 load_dotenv() 
 # 1️⃣ Configure Gemini API
@@ -15,37 +29,36 @@ if not api_token:
 client = genai.Client(api_key=api_token)
 
 
-def llm_process():
-    # 2️⃣ Load scraped markdown
-    try:
-        with open("markdown.md", "r", encoding="utf-8") as f:
-            markdown_data = f.read()
-    except FileNotFoundError:
-        print("Error: 'markdown.md' file not found. Please run crawler.py first.")
-        exit()
-
-    # 3️⃣ Split into product blocks (separated by blank lines)
-    products = [p.strip() for p in markdown_data.strip().split("\n\n") if p.strip()]
-
-    for product in products:
-      print(product)
-
-    OUTPUT_FILENAME = "products_batch.jsonl" 
-    PRODUCT_DELIMITER = "\n\n---PRODUCT-SEPARATOR---\n\n"
-
-    # Process in chunks of 1000
-    for start in range(0, len(products), 1000):
-        chunk = products[start:start+1000]
-        all_product_markdowns = PRODUCT_DELIMITER.join([md(p) for p in chunk])
+OUTPUT_FILENAME = "products_batch.jsonl"
+PRODUCT_DELIMITER = "\n\n---PRODUCT-SEPARATOR---\n\n"
+MODEL = "gemini-2.5-flash-lite"
+# Bump whenever build_prompt changes, so cached results from the old prompt are not reused
+PROMPT_VERSION = "products-v3"
+LLM_CACHE_FILE = ".llm_cache.sqlite"
+# Prompt tokens per request, instructions included; several fit in one minute's TPM quota
+BATCH_TOKEN_CEILING = 60_000
+# Output budget per request, and the JSON tokens one extracted product takes
+MAX_OUTPUT_TOKENS = 60_000
+OUTPUT_TOKENS_PER_RECORD = 120
+# Smallest batch that is still bisected when the model returns unparsable JSON
+MIN_BATCH_SIZE = 10
+# Rounds of resubmitting records the model skipped
+MAX_RESUBMITS = 2
+# Records preprocessed and batched together; bounds memory on large crawls
+RECORD_CHUNK = 5_000
 
-        print(f"Starting batch extraction for products {start+1}–{start+len(chunk)}. Appending to {OUTPUT_FILENAME}...")
 
-        # The schema is now defined directly in the prompt (no Pydantic)
-        prompt = f"""
+def build_prompt(all_product_markdowns):
+    # The schema is now defined directly in the prompt (no Pydantic)
+    return f"""
         You are an expert product data extraction system.
-        Each product record is separated by the text '---PRODUCT-SEPARATOR---'.
+        Each product record is separated by the text '---PRODUCT-SEPARATOR---'
+        and starts with a line '[[ID: ...]]' holding its record ID, followed by
+        a line '[[FIELDS: ...]]' listing the fields still needed for it.
 
-        For EACH record, extract the following fields if available:
+        For EACH record, extract the fields named in its '[[FIELDS: ...]]' line,
+        if available. The possible fields are:
+        - id: the record ID from its '[[ID: ...]]' line, copied exactly
         - url: URL of the product page
         - photo: URL of the main product photo
         - title: name or title of the product
@@ -57,6 +70,7 @@ def llm_process():
         Return ONLY a single valid JSON array of objects, like:
         [
           {{
+            "id": "R0",
             "url": "...",
             "photo": "...",
             "title": "...",
@@ -68,6 +82,8 @@ def llm_process():
           ...
         ]
 
+        Return exactly one object per record ID, in input order, holding its
+        id and only the fields named in its '[[FIELDS: ...]]' line.
         If a field is not found, set it to null. 
         Do not include any explanations, markdown, or extra text.
 
@@ -75,36 +91,333 @@ def llm_process():
         {all_product_markdowns}
         """
 
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-lite",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-
-            # Directly parse JSON
-            extracted_products = []
-            try:
-                extracted_products = json.loads(response.text)
-            except Exception as parse_err:
-                print("⚠️ Failed to parse JSON, writing raw text instead.")
-                with open(OUTPUT_FILENAME, "a", encoding="utf-8") as f:
-                    f.write(response.text.strip() + "\n")
+
+def record_block(record_id, markdown, fields):
+    return f"[[ID: {record_id}]]\n[[FIELDS: {', '.join(fields)}]]\n{markdown}"
+
+
+def has_fields(product_data):
+    return any(v is not None for k, v in product_data.items() if k != "id")
+
+
+async def extract_products(scheduler, records, fields, stats, depth=0, resubmits=MAX_RESUBMITS):
+    """
+    Extract products for `records` ({record_id: markdown}), keyed by record ID.
+
+    Only the fields in `fields[record_id]` are requested for each record.
+
+    Every returned object must carry the ID of a submitted record; objects with
+    unknown or repeated IDs are dropped. Complete objects are kept even from a
+    truncated array. Records the model skipped are handled in one of two ways:
+    - after unparsable JSON they are bisected, down to MIN_BATCH_SIZE
+    - otherwise only the missing IDs are resubmitted, up to `resubmits` times
+    Tokens are booked as first-pass (a full batch parsed on the first try) or
+    recovery (everything else).
+    """
+    all_product_markdowns = PRODUCT_DELIMITER.join(
+        record_block(record_id, product, fields[record_id]) for record_id, product in records.items()
+    )
+    response = await scheduler.generate(
+        MODEL,
+        build_prompt(all_product_markdowns),
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json"
+        ),
+    )
+    tokens = response_tokens(response)
+    text = response.text or ""
+
+    try:
+        parsed = json.loads(text)
+        parsed = [parsed] if isinstance(parsed, dict) else parsed
+        complete = isinstance(parsed, list)
+    except json.JSONDecodeError:
+        complete = False
+    if not complete:
+        parsed, _ = salvage_json_array(text)
+    stats["first_pass_tokens" if depth == 0 and complete else "recovery_tokens"] += tokens
+    if not complete:
+        stats["salvaged"] += len(parsed)
+
+    extracted = {}
+    for product_data in parsed:
+        record_id = str(product_data.get("id")) if isinstance(product_data, dict) else None
+        if record_id in records and record_id not in extracted:
+            extracted[record_id] = product_data
+        else:
+            stats["unknown_ids"] += 1
+
+    missing = [record_id for record_id in records if record_id not in extracted]
+    if not missing:
+        return extracted
+
+    if not complete and len(missing) > MIN_BATCH_SIZE:
+        half = len(missing) // 2
+        print(f"⚠️ Unparsable JSON; kept {len(extracted)}, bisecting {len(missing)} missing records.")
+        stats["bisections"] += 1
+        parts = await asyncio.gather(
+            extract_products(scheduler, {r: records[r] for r in missing[:half]}, fields, stats, depth + 1, resubmits),
+            extract_products(scheduler, {r: records[r] for r in missing[half:]}, fields, stats, depth + 1, resubmits),
+        )
+    elif resubmits > 0:
+        print(f"🔁 {len(missing)} of {len(records)} record IDs missing; resubmitting only those.")
+        stats["resubmitted"] += len(missing)
+        parts = [await extract_products(
+            scheduler, {r: records[r] for r in missing}, fields, stats, depth + 1, resubmits - 1
+        )]
+    else:
+        print(f"⚠️ Giving up on {len(missing)} record(s) the model never returned.")
+        stats["missing"] += len(missing)
+        parts = []
+
+    for part in parts:
+        extracted.update(part)
+    return extracted
+
+
+def write_products(records, extracted, stats):
+    """
+    Append `extracted` to OUTPUT_FILENAME in the order of `records` ({record_id: record}); returns the count written.
+
+    Each product carries the listing page and card position it was scraped from.
+    """
+    # Only whole JSON objects ever reach the JSONL file
+    written = 0
+    with open(OUTPUT_FILENAME, "a", encoding="utf-8") as f:
+        for record_id, record in records.items():
+            product_data = extracted.get(record_id)
+            if product_data is None:
                 continue
+            if not has_fields(product_data):
+                stats["empty"] += 1
+                continue
+            product_data = {**product_data, "page_url": record["url"], "card": record["card"]}
+            f.write(json.dumps(product_data, ensure_ascii=False) + "\n")
+            written += 1
+    return written
+
+
+def save_results(values, partials, duplicates, cache, stats):
+    """
+    Merge the model's `values` ({record_id: {field: value}}) into each record's rule-based data; returns the count written.
 
-            # Append results
-            with open(OUTPUT_FILENAME, "a", encoding="utf-8") as f:
-                for product_data in extracted_products:
-                    f.write(json.dumps(product_data, ensure_ascii=False) + "\n")
+    Each record's values are reattached to its `duplicates`, which keep their
+    own rule-based values. Results are cached under the raw HTML and appended
+    to OUTPUT_FILENAME.
+    """
+    extracted, all_records = {}, {}
+    for record_id, record_values in values.items():
+        for copy_id in [record_id, *duplicates.get(record_id, [])]:
+            all_records[copy_id] = partials[copy_id][2]
+            extracted[copy_id] = {"id": copy_id, **partials[copy_id][0], **record_values}
 
-            print(f"✅ Batch {start//1000+1} complete. Wrote {len(extracted_products)} products.")
+    for record_id, product_data in extracted.items():
+        cache.put(MODEL, PROMPT_VERSION, all_records[record_id]["html"],
+                  {k: v for k, v in product_data.items() if k != "id"})
+    cache.commit()
+    return write_products(all_records, extracted, stats)
+
+
+async def process_batch(scheduler, batch_number, records, compacted, partials, stats, cache, urls, duplicates):
+    """
+    Extract one batch through the quota scheduler and append it to OUTPUT_FILENAME.
+
+    The model sees the `compacted` markdown; short URL IDs in its answer are
+    restored from `urls`. Returns the model's values by record ID (see
+    save_results), or None when the batch failed.
+    """
+    print(f"Starting batch extraction for batch {batch_number} ({len(records)} products). Appending to {OUTPUT_FILENAME}...")
+
+    fields = {record_id: partials[record_id][1] for record_id in records}
+    try:
+        llm_products = await extract_products(
+            scheduler, {record_id: compacted[record_id] for record_id in records}, fields, stats
+        )
+    except Exception as e:
+        print(f"❌ Batch {batch_number} failed. Error: {e}")
+        return None
+
+    # The model only fills the residual fields; rule-based values are kept as they are.
+    # Records the model never returned are not cached, so a re-run retries them.
+    values = {
+        record_id: {field: urls.restore(llm_products[record_id].get(field)) for field in fields[record_id]}
+        for record_id in records if record_id in llm_products
+    }
+    written = save_results(values, partials, duplicates, cache, stats)
+    print(f"✅ Batch {batch_number} complete. Wrote {written} products.")
+    return values
+
+
+async def process_chunk(records, scheduler, counter, cache, stats, first_batch, seen, resolved, workers=None):
+    """
+    Extract one chunk of records ({record_id: record}); returns (records done by rules, failed batch numbers, batches).
+
+    Batches are numbered from `first_batch`. `seen` (a DedupIndex) and
+    `resolved` ({record_id: model values}) carry the records extracted in
+    earlier chunks; duplicates of those reuse their values, and this chunk's
+    results are added to both.
+    """
+    # Rules, fingerprints, compaction and markdown all come from one parse per record, across all cores
+    prepared, cpu_stats = parallel_map(
+        partial(prepare_record, site="daraz"), [record["html"] for record in records.values()], workers=workers
+    )
+    prepared = dict(zip(records, prepared))
+    print(f"⚙️ Preprocessing: {format_cpu_stats(cpu_stats)}")
+
+    # Records whose required fields the selectors fill with confidence skip the model
+    deterministic, partials = {}, {}
+    for record_id, record in records.items():
+        data, fields = prepared[record_id]["data"], prepared[record_id]["fields"]
+        if fields:
+            partials[record_id] = (data, fields, record)
+            stats.update(f"field_{field}" for field in fields)
+        else:
+            deterministic[record_id] = {"id": record_id, **data}
+    if deterministic:
+        written = write_products(records, deterministic, stats)
+        print(f"🧩 {len(deterministic)} records extracted by rules alone ({written} products written).")
+
+    # Unchanged records reuse their earlier result and never reach the model
+    cached = {}
+    for record_id in partials:
+        product_data = cache.get(MODEL, PROMPT_VERSION, records[record_id]["html"])
+        if product_data is not None:
+            cached[record_id] = {"id": record_id, **product_data}
+            remember(seen, resolved, record_id, prepared, partials, product_data)
+    if cached:
+        written = write_products(records, cached, stats)
+        print(f"♻️ {len(cached)} records served from the LLM cache ({written} products written).")
+
+    # Revisited listings are extracted once; their copies get the same result
+    pending = {record_id: records[record_id]["html"] for record_id in partials if record_id not in cached}
+    record_ids, duplicates, dedup_stats = dedup_records(
+        pending,
+        groups={record_id: tuple(partials[record_id][1]) for record_id in pending},
+        fingerprints={record_id: prepared[record_id]["fingerprint"] for record_id in pending},
+    )
+
+    # Listings extracted in an earlier chunk were revisited under other tracking URLs, so they miss the cache
+    carried = {}
+    for record_id in record_ids:
+        match, kind = seen.find(prepared[record_id]["fingerprint"], tuple(partials[record_id][1]))
+        if match:
+            carried[record_id] = resolved[match]
+            dedup_stats[f"earlier_{kind}"] += 1 + len(duplicates.get(record_id, []))
+    if carried:
+        record_ids = [record_id for record_id in record_ids if record_id not in carried]
+        written = save_results(carried, partials, duplicates, cache, stats)
+        print(f"🧬 {dedup_stats['earlier_exact'] + dedup_stats['earlier_near']} records duplicate listings extracted "
+              f"in an earlier chunk ({written} products written).")
+
+    # The model gets compacted markdown: no styling attributes or boilerplate, long URLs as short IDs.
+    # Each worker shortened its record's URLs on its own, so IDs are re-checked against one shared table.
+    urls = UrlTable()
+    compacted = {
+        record_id: urls.merge(prepared[record_id]["urls"], prepared[record_id]["compact_markdown"])
+        for record_id in record_ids
+    }
+    raw_tokens = {
+        record_id: counter.count(record_block(record_id, prepared[record_id]["markdown"], partials[record_id][1]))
+        for record_id in record_ids
+    }
+
+    # Batches are packed close to the token ceiling, and never above one minute's quota
+    ceiling = min(BATCH_TOKEN_CEILING, scheduler.token_budget)
+    record_budget = ceiling - counter.count(build_prompt(""))
+    delimiter_tokens = counter.count(PRODUCT_DELIMITER)
+    sizes = {
+        record_id: counter.count(record_block(record_id, compacted[record_id], partials[record_id][1])) + delimiter_tokens
+        for record_id in record_ids
+    }
+    batches = [
+        {record_id: records[record_id] for record_id in batch}
+        for batch in pack_records(list(sizes.items()), record_budget, max_records=MAX_OUTPUT_TOKENS // OUTPUT_TOKENS_PER_RECORD)
+    ]
+    if batches:
+        print(f"📦 Packed {len(sizes)} records ({sum(sizes.values())} tokens, counted {counter.describe()}) "
+              f"into {len(batches)} requests under {ceiling} tokens.")
+    if duplicates:
+        saved = sum(sizes[record_id] * len(copies) for record_id, copies in duplicates.items() if record_id in sizes)
+        print(f"🧬 Dedup: {len(record_ids)} unique records sent for {len(pending)} ({dedup_stats['exact']} exact, "
+              f"{dedup_stats['near']} near duplicates), ~{saved} tokens saved.")
+    for i, batch in enumerate(batches):
+        before = sum(raw_tokens[record_id] + delimiter_tokens for record_id in batch)
+        after = sum(sizes[record_id] for record_id in batch)
+        print(f"🗜️ Batch {first_batch + i}: {before} → {after} record tokens after compaction ({1 - after / before:.0%} saved)")
+    results = await asyncio.gather(*(
+        process_batch(scheduler, first_batch + i, batch, compacted, partials, stats, cache, urls, duplicates)
+        for i, batch in enumerate(batches)
+    ))
+    for values in results:
+        for record_id, record_values in (values or {}).items():
+            remember(seen, resolved, record_id, prepared, partials, record_values)
+    failed = [first_batch + i for i, values in enumerate(results) if values is None]
+    return len(deterministic), failed, len(batches)
+
+
+def remember(seen, resolved, record_id, prepared, partials, product_data):
+    """Make an extracted record the representative later chunks' duplicates resolve to."""
+    fields = partials[record_id][1]
+    seen.add(record_id, prepared[record_id]["fingerprint"], tuple(fields))
+    resolved[record_id] = {field: product_data.get(field) for field in fields}
+
+
+async def run_batches(records, tpm=250_000, rpm=15, max_concurrency=4, workers=None, chunk_size=RECORD_CHUNK):
+    """
+    Extract products from an iterable of records (see iter_records), `chunk_size` records at a time.
+
+    Only one chunk of records is held in memory at once; dedup spans chunks
+    through the fingerprints and model values of the records extracted so far.
+    The batches of a chunk are submitted concurrently; the scheduler keeps
+    them under the TPM/RPM quota.
+    """
+    counter = TokenCounter(MODEL)
+    scheduler = QuotaScheduler(client, tpm=tpm, rpm=rpm, max_concurrency=max_concurrency, counter=counter)
+    stats = Counter()
+    cache = LLMCache(LLM_CACHE_FILE)
+    seen, resolved = DedupIndex(), {}
+
+    records = iter(records)
+    total = deterministic = batches = 0
+    failed = []
+    while True:
+        # IDs are the record's position in RECORDS_FILE, so they stay stable across runs
+        chunk = {f"R{total + i}": record for i, record in enumerate(islice(records, chunk_size))}
+        if not chunk:
+            break
+        total += len(chunk)
+        done, chunk_failed, chunk_batches = await process_chunk(
+            chunk, scheduler, counter, cache, stats, batches + 1, seen, resolved, workers=workers
+        )
+        deterministic += done
+        failed += chunk_failed
+        batches += chunk_batches
+    cache_stats = cache.stats()
+    cache.close()
+    counter.save()
+
+    print(f"🧩 Rules: {deterministic} of {total} records complete without the LLM")
+    residual = {k[len("field_"):]: v for k, v in stats.items() if k.startswith("field_")}
+    if residual:
+        print(f"   Fields requested from the LLM: {residual}")
+    print(f"📊 Gemini usage: {scheduler.summary()}")
+    print(f"📊 Tokens: {stats['first_pass_tokens']} first-pass, {stats['recovery_tokens']} recovery "
+          f"({stats['bisections']} bisections, {stats['salvaged']} objects salvaged from truncated output)")
+    print(f"🆔 Records: {stats['resubmitted']} resubmitted by ID, {stats['missing']} never returned, "
+          f"{stats['empty']} with no fields, {stats['unknown_ids']} objects with unknown IDs dropped")
+    print(f"♻️ LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+          f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1e6:.1f} MB)")
+    if failed:
+        print(f"❌ Batches {failed} failed after retries; re-run llm_process to retry them.")
+
+
+def llm_process():
+    # 2️⃣ Stream the scraped product records, one card per record
+    if not os.path.exists(RECORDS_FILE):
+        print(f"Error: '{RECORDS_FILE}' file not found. Please run crawler.py first.")
+        exit()
 
-        except Exception as e:
-            print(f"❌ Batch {start//1000+1} failed. Error: {e}")
-            if "response" in locals() and response and hasattr(response, "prompt_feedback"):
-                print(f"   Prompt Feedback: {response.prompt_feedback}")
+    asyncio.run(run_batches(iter_records(RECORDS_FILE)))
 
 # time -> 20sec for 40 products
 if __name__=="__main__":
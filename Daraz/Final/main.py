@@ -1,11 +1,28 @@
-from crawlScrap import crawlScrap
-from llm import llm_process
+from crawlScrap import crawlScrap, scrapFromCache
 
+import argparse
 import asyncio
 
 if __name__=="__main__":
-  asyncio.run(crawlScrap())
-  llm_process()
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--from-cache", action="store_true",
+                      help="re-run extraction and the LLM stage on cached HTML instead of re-crawling")
+  parser.add_argument("--extract", choices=["llm", "schema"], default="llm",
+                      help="'schema' extracts with an LLM-induced CSS schema instead of per-batch LLM calls")
+  parser.add_argument("--block-resources", action="store_true",
+                      help="skip images, fonts, media and trackers while crawling (only the card DOM is needed)")
+  args = parser.parse_args()
+
+  if args.from_cache:
+    scrapFromCache()
+  else:
+    asyncio.run(crawlScrap(block_resources=args.block_resources))
+  if args.extract == "schema":
+    from schema import schema_process
+    schema_process()
+  else:
+    from llm import llm_process
+    llm_process()
   
   
 # Starting batch extraction for products 1–1000. Appending to products_batch.jsonl...
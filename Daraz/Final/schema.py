@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+from crawl4ai import JsonCssExtractionStrategy, LLMConfig
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.records import RECORDS_FILE, iter_records
+from crawl_common.schema_induction import SchemaStore
+
+load_dotenv()
+
+OUTPUT_FILENAME = "products_batch.jsonl"
+REQUIRED_FIELDS = ["url", "title", "price"]
+SCHEMA_QUERY = (
+    "Each div.Ms6aG is one product card. Extract url (product link href), photo "
+    "(main image src), title, price (with currency), units_sold (the 'N sold' text), "
+    "rating and location (seller location)."
+)
+SCHEMA_EXAMPLE = json.dumps({
+    "url": "//www.daraz.com.np/products/example-i123.html",
+    "photo": "https://img.drz.lazcdn.com/static/np/p/example.jpg_200x200q80.avif",
+    "title": "Example product",
+    "price": "Rs. 1,299",
+    "units_sold": "37 sold",
+    "rating": "(12)",
+    "location": "Bagmati Province",
+})
+
+
+def sample_cards(records, samples=8, cards_per_sample=5, seed=0):
+    """
+    Group cards drawn from the whole of `records` into `samples` small HTML documents for induction and validation.
+
+    One pass of reservoir sampling, so only the picked cards are held in memory;
+    the fixed seed keeps the samples, and with them the cached schema's score, stable across runs.
+    """
+    rng = random.Random(seed)
+    size = samples * cards_per_sample
+    picked = []  # (position, html)
+    for i, record in enumerate(records):
+        if len(picked) < size:
+            picked.append((i, record["html"]))
+        else:
+            j = rng.randrange(i + 1)
+            if j < size:
+                picked[j] = (i, record["html"])
+    cards = [html for _, html in sorted(picked)]
+    return [
+        "<div>" + "".join(cards[i:i + cards_per_sample]) + "</div>"
+        for i in range(0, len(cards), cards_per_sample)
+    ]
+
+
+def schema_process():
+    """
+    Extract every product card in RECORDS_FILE with an LLM-induced CSS schema.
+
+    The LLM only sees a few sample cards, once per site; the cached schema is
+    re-used until it stops scoring well on fresh cards. Records are streamed
+    twice (sampling, then extraction) and never held in memory together.
+    Products carry the same id, page_url and card fields as llm.py writes.
+    """
+    if not os.path.exists(RECORDS_FILE):
+        print(f"Error: '{RECORDS_FILE}' file not found. Please run crawler.py first.")
+        exit()
+    llm_config = LLMConfig(provider="gemini/gemini-2.5-flash-lite", api_token=os.getenv("GEMINI_API_TOKEN"))
+    schema = asyncio.run(SchemaStore().get(
+        "daraz", sample_cards(iter_records(RECORDS_FILE)), REQUIRED_FIELDS, SCHEMA_QUERY, SCHEMA_EXAMPLE,
+        llm_config=llm_config,
+    ))
+
+    strategy = JsonCssExtractionStrategy(schema)
+    written = missed = 0
+    with open(OUTPUT_FILENAME, "a", encoding="utf-8") as f:
+        # IDs are the record's position in RECORDS_FILE, as in llm.py
+        for i, record in enumerate(iter_records(RECORDS_FILE)):
+            products = [item for item in strategy.extract("raw:", "<div>" + record["html"] + "</div>") if item]
+            missed += not products
+            for product_data in products:
+                product_data = {"id": f"R{i}", **product_data, "page_url": record["url"], "card": record["card"]}
+                f.write(json.dumps(product_data, ensure_ascii=False) + "\n")
+                written += 1
+    print(f"✅ Schema extraction complete. Wrote {written} products to {OUTPUT_FILENAME} with 0 LLM calls.")
+    if missed:
+        print(f"⚠️ {missed} records matched no product card.")
+
+
+if __name__ == "__main__":
+    schema_process()
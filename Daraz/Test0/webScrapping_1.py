@@ -4,6 +4,10 @@ import json
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
 from crawl4ai.deep_crawling.filters import FilterChain, DomainFilter, URLPatternFilter
 from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.rate_limit import HostRateLimiter
 
 async def daraz_catalog_scrape_to_csv():
     # 1️⃣ Define filters to crawl only product pages
@@ -28,7 +32,9 @@ async def daraz_catalog_scrape_to_csv():
         writer = csv.writer(f)
         writer.writerow(["URL", "Title", "Photo", "Rating", "Price", "Description"])
 
+        rate_limiter = HostRateLimiter()
         async with AsyncWebCrawler() as crawler:
+            rate_limiter.attach(crawler)  # per-host budget instead of sleeping in the loop
             async for result in await crawler.arun(
                 "https://www.daraz.com.np/catalog/?spm=a2a0e.searchlist.cate_6.5.6ca355a3zrHeVR&q=Smartphones&from=hp_categories&src=all_channel",
                 config=config
@@ -39,7 +45,6 @@ async def daraz_catalog_scrape_to_csv():
 
                     # Default values
                     photo = rating = price = description = "N/A"
-                    await asyncio.sleep(2)
 
                     # Attempt to extract JSON-LD data from HTML
                     if result.html:
@@ -1,7 +1,10 @@
 import os
 import json
-from bs4 import BeautifulSoup
 import google.generativeai as genai
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.pre_extract import pre_extract, residual_fields
 
 # 1️⃣ Configure Gemini API
 api_token = os.getenv("GEMINI_API_TOKEN")
@@ -10,48 +13,6 @@ if not api_token:
 genai.configure(api_key=api_token)
 
 
-def parse_with_bs(html_block: str) -> dict:
-    """Extract obvious fields with BeautifulSoup as pre-parser."""
-    soup = BeautifulSoup(html_block, "html.parser")
-
-    # Default structure
-    data = {
-        "url": None,
-        "photo": None,
-        "title": None,
-        "price": None,
-        "units_sold": None,
-        "rating": None,
-        "location": None,
-    }
-
-    # Extract fields if available
-    a_tag = soup.find("a", href=True)
-    if a_tag:
-        data["url"] = "https:" + a_tag["href"] if a_tag["href"].startswith("//") else a_tag["href"]
-
-    img_tag = soup.find("img")
-    if img_tag and img_tag.get("src"):
-        data["photo"] = img_tag["src"]
-
-    title_tag = soup.find("a", title=True)
-    if title_tag:
-        data["title"] = title_tag["title"]
-
-    price_tag = soup.find("span", class_="ooOxS")
-    if price_tag:
-        data["price"] = price_tag.get_text(strip=True)
-
-    location_tag = soup.find("span", class_="oa6ri")
-    if location_tag:
-        data["location"] = location_tag.get_text(strip=True)
-
-    # Units sold and rating are not always explicit → left for Gemini
-    return data
-
-
-
-
 # 2️⃣ Load scraped markdown
 try:
     with open("scraped_output.md", "r", encoding="utf-8") as f:
@@ -66,25 +27,27 @@ products = [p.strip() for p in markdown_data.strip().split("\n\n") if p.strip()]
 # Initialize model + results
 model = genai.GenerativeModel("gemini-2.0-flash-lite")
 output_data = []
+llm_calls = 0
 
 
 for product_md in products:
-    # First, parse with BeautifulSoup
-    bs_data = parse_with_bs(product_md)
+    # First, extract what the per-site selectors can fill with confidence
+    bs_data, confidence = pre_extract(product_md, "daraz")
+    missing = residual_fields(confidence, "daraz")
+    if not missing:
+        output_data.append(bs_data)
+        continue
 
     # Prompt Gemini only for the missing fields
+    llm_calls += 1
+    field_list = "\n".join(f"    - {field}" for field in missing)
+    known = {k: v for k, v in bs_data.items() if k not in missing}
     prompt = f"""
     Extract the following fields from the markdown content and return JSON only:
-    - url
-    - photo
-    - title
-    - price
-    - units_sold
-    - rating
-    - location
+{field_list}
 
-    Some fields may already be known:
-    {json.dumps(bs_data, indent=2)}
+    Some fields are already known:
+    {json.dumps(known, indent=2)}
 
     If a field is not found, set it to null. Do not add extra text.
 
@@ -102,8 +65,8 @@ for product_md in products:
 
         gemini_data = json.loads(response.text)
 
-        # Merge Gemini’s response with BeautifulSoup defaults
-        merged = {k: gemini_data.get(k) or bs_data.get(k) for k in bs_data.keys()}
+        # Gemini only fills the missing fields; rule-based values are kept
+        merged = {k: gemini_data.get(k) if k in missing else bs_data.get(k) for k in bs_data.keys()}
 
     except Exception as e:
         print(f"⚠️ Failed to process product: {e}")
@@ -115,4 +78,4 @@ for product_md in products:
 with open("products.json", "w", encoding="utf-8") as f:
     json.dump(output_data, f, indent=4, ensure_ascii=False)
 
-print("✅ Extraction complete. Saved to products.json")
+print(f"✅ Extraction complete. Saved to products.json ({llm_calls} of {len(products)} products needed Gemini)")
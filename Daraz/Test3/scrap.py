@@ -1,52 +1,200 @@
+import argparse
 import asyncio
 import base64
 import os
+import random
+from collections import Counter
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, ProxyConfig, ProxyRotationStrategy
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.readiness import SITE_READY_SELECTORS, format_readiness, readiness_wait
+from crawl_common.blocking import ResourceBlocker, format_blocking
+from crawl_common.rate_limit import HostRateLimiter
+from crawl_common.concurrency import AdaptiveConcurrency, outcome_for
 
-async def scrape_url(semaphore, crawler, url, config):
-    async with semaphore:
+class ScrapeError(Exception):
+    """A failed scrape attempt, tagged with a category for the failure report."""
+
+    def __init__(self, category, message):
+        super().__init__(message)
+        self.category = category
+
+
+# HTTP statuses worth retrying; any other 4xx is final
+RETRYABLE_STATUS = {408, 425, 429}
+# Text only found on Daraz's anti-bot interstitial
+BLOCK_PAGE_MARKERS = ("_____tmd_____/punish", "unusual traffic")
+
+
+async def fetch_products(crawler, url, config):
+    """Single scrape attempt. Returns the product divs or raises ScrapeError."""
+    result = await crawler.arun(url, config=config)
+
+    status = getattr(result, "status_code", None)
+    if status and status >= 400:
+        raise ScrapeError(f"http_{status}", f"HTTP status {status}")
+    if not result.success:
+        raise ScrapeError("crawl_error", result.error_message or "crawl failed")
+
+    html = result.html
+    print(f"⏱️ {url}: {format_readiness(html)}; {format_blocking(html)}")
+    soup = BeautifulSoup(html, "html.parser")
+    divs = soup.find_all("div", class_="Ms6aG")
+    if not divs:
+        if any(marker in html for marker in BLOCK_PAGE_MARKERS):
+            raise ScrapeError("blocked", "Anti-bot block page")
+        print(html)
+        raise ScrapeError("selector_missing", "No <div class='Ms6aG'> found")
+
+    content = ""
+    for div in divs:
+        content += str(div) + "\n\n"
+    return content
+
+
+async def scrape_url(crawler, url, config, failures, attempt_timeout=90, retries=3, backoff=2.0, controller=None, rate_limiter=None):
+    """
+    Scrape one URL with a deadline per attempt and jittered exponential retries.
+
+    Returns the product divs, or None once every attempt failed; the category
+    of the last failure is counted in `failures`. With a `controller`, each
+    attempt waits for a slot on the host and reports its outcome back. With
+    a `rate_limiter`, its token is taken before the slot, so neither the
+    latency the controller sees nor the attempt deadline includes the wait.
+    """
+    print(f"🔗 Scraping: {url}")
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            await rate_limiter.reserve(url)
+        token = await controller.acquire(url) if controller else None
+        category = None
         try:
-            print(f"🔗 Scraping: {url}")
-            result = await crawler.arun(url, config=config)
-
-            if result.success:
-                html = result.html
-                soup = BeautifulSoup(html, "html.parser")
-                divs = soup.find_all("div", class_="Ms6aG")
-
-                content = ""
-                if divs:
-                    for div in divs:
-                        content += str(div) + "\n\n"
-                else:
-                    print(f"⚠️ No <div class='Ms6aG'> found in {url}")
-                    print(html)
-                return content
-
-            else:
-                print(f"❌ Failed to scrape {url}: {result.error_message}")
-                return ""
+            return await asyncio.wait_for(fetch_products(crawler, url, config), timeout=attempt_timeout)
+        except asyncio.TimeoutError:
+            category, message = "timeout", f"no result within {attempt_timeout}s"
+        except ScrapeError as e:
+            category, message = e.category, str(e)
         except Exception as e:
-            print(f"❌ Error scraping {url}: {e}")
-            return ""
+            category, message = "error", str(e)
+        finally:
+            if rate_limiter:
+                rate_limiter.discard(url)
+            if token:
+                await controller.release(token, outcome_for(category))
+
+        final = attempt == retries
+        if category.startswith("http_") and int(category[5:]) < 500 and int(category[5:]) not in RETRYABLE_STATUS:
+            final = True
+        if final:
+            print(f"❌ Giving up on {url} after {attempt + 1} attempt(s): {category} - {message}")
+            failures[category] += 1
+            return None
+
+        delay = random.uniform(0, backoff * 2 ** attempt)
+        print(f"⚠️ Attempt {attempt + 1} failed for {url} ({category}: {message}). Retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
 
+def read_urls(filename):
+    """Yield non-empty lines of a URL list without loading the whole file."""
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line.strip()
 
-async def scrape_filtered_urls_throttled(concurrency_limit=1):
-    print(f"🚀 Starting throttled scraping with concurrency limit: {concurrency_limit}")
 
-    with open("filtered_urls.txt", "r", encoding="utf-8") as f:
-        urls = [line.strip() for line in f if line.strip()]
+async def run_worker_pool(crawler, urls, config, out, concurrency_limit, ordered=False, dead_letter=None, failures=None, controller=None, rate_limiter=None):
+    """
+    Scrape `urls` with a fixed pool of workers and stream each page to `out`.
 
-    if not urls:
-        print("❌ No URLs found in filtered_urls.txt")
+    Workers pull (index, url) pairs from a bounded queue and hand finished
+    pages to a single writer, so at most a few pages per worker are held in
+    memory no matter how long the URL list is. With `ordered=True` the writer
+    holds back pages that finish early until every earlier page is written,
+    which keeps the output in input order. URLs that still fail after all
+    retries are written to `dead_letter`, one per line. With a `controller`,
+    `concurrency_limit` is only the worker count; the controller decides how
+    many of them may fetch at once.
+    """
+    failures = Counter() if failures is None else failures
+    url_queue = asyncio.Queue(maxsize=concurrency_limit * 2)
+    done_queue = asyncio.Queue()
+    # Caps pages that are in flight or waiting for the writer
+    window = asyncio.Semaphore(concurrency_limit * 4)
+    written = 0
+
+    async def producer():
+        for item in enumerate(urls):
+            await window.acquire()
+            await url_queue.put(item)
+        for _ in range(concurrency_limit):
+            await url_queue.put(None)
+
+    async def worker():
+        while True:
+            item = await url_queue.get()
+            if item is None:
+                await done_queue.put(None)
+                return
+            index, url = item
+            content = await scrape_url(crawler, url, config, failures, controller=controller, rate_limiter=rate_limiter)
+            await done_queue.put((index, url, content))
+
+    def write(url, content):
+        nonlocal written
+        if content is None:
+            if dead_letter is not None:
+                dead_letter.write(url + "\n")
+                dead_letter.flush()
+        else:
+            out.write(content)
+            written += 1
+        window.release()
+
+    async def writer():
+        pending = {}
+        next_index = 0
+        finished_workers = 0
+        while finished_workers < concurrency_limit:
+            item = await done_queue.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            if not ordered:
+                write(item[1], item[2])
+                continue
+            pending[item[0]] = item[1:]
+            while next_index in pending:
+                write(*pending.pop(next_index))
+                next_index += 1
+
+    await asyncio.gather(producer(), writer(), *(worker() for _ in range(concurrency_limit)))
+    return written
+
+
+async def scrape_filtered_urls_throttled(concurrency_limit=1, ordered=False, input_file="filtered_urls.txt", dead_letter_file="failed_urls.txt", block_resources=False, adaptive=True, max_concurrency=4):
+    """
+    With `adaptive=True`, `concurrency_limit` is the starting point and an
+    AIMD controller tunes it between 1 and `max_concurrency` per host.
+    """
+    if adaptive:
+        print(f"🚀 Starting throttled scraping with adaptive concurrency: {concurrency_limit} (max {max_concurrency})")
+    else:
+        print(f"🚀 Starting throttled scraping with concurrency limit: {concurrency_limit}")
+
+    if not os.path.exists(input_file) or next(read_urls(input_file), None) is None:
+        print(f"❌ No URLs found in {input_file}")
         return
 
     config = CrawlerRunConfig(
         # --- LAZY LOADING & DELAY HANDLING ---
-        delay_before_return_html=10.0,   # Increased wait time for rendering
+        wait_for=readiness_wait(SITE_READY_SELECTORS["daraz"]),  # Wait until the product cards stop changing
+        wait_for_timeout=25000,
+        delay_before_return_html=0.5,
         scroll_delay=1.5,                # Add small pauses during scroll to mimic human
         max_scroll_steps=10,              # Limit scrolls to avoid infinite loops
         js_code="""
@@ -89,27 +237,47 @@ async def scrape_filtered_urls_throttled(concurrency_limit=1):
 
         # check_robots_txt=False,                    # Avoid blocking if robots.txt disallows
         
-        # --- TIMING BEHAVIORS (avoid patterns) ---
-        mean_delay=2.0,                            # Random delay between actions
-        max_range=5.0,
     )
 
-    scraped_content = ""
-    semaphore = asyncio.Semaphore(concurrency_limit)
-
-    async with AsyncWebCrawler() as crawler:
-        tasks = [scrape_url(semaphore, crawler, url, config) for url in urls]
-        results = await asyncio.gather(*tasks)
-
-        for content in results:
-            scraped_content += content
-
+    # Appending lets a re-run from the dead-letter file add to earlier output
     output_filename = "scraped_output.md"
-    with open(output_filename, "w", encoding="utf-8") as f:
-        f.write(scraped_content)
+    output_mode = "w" if input_file == "filtered_urls.txt" else "a"
+    failures = Counter()
+    # Written next to the target first, so the dead-letter file can be the input
+    dead_letter_tmp = dead_letter_file + ".tmp"
+    blocker = ResourceBlocker.for_site("daraz") if block_resources else None
+    rate_limiter = HostRateLimiter()
+    controller = AdaptiveConcurrency(initial=concurrency_limit, maximum=max_concurrency) if adaptive else None
+    async with AsyncWebCrawler() as crawler:
+        rate_limiter.attach(crawler)
+        if blocker:
+            blocker.attach(crawler)
+        with open(output_filename, output_mode, encoding="utf-8") as out, \
+                open(dead_letter_tmp, "w", encoding="utf-8") as dead_letter:
+            total = await run_worker_pool(
+                crawler, read_urls(input_file), config, out,
+                max_concurrency if adaptive else concurrency_limit,
+                ordered=ordered, dead_letter=dead_letter, failures=failures, controller=controller,
+                rate_limiter=rate_limiter,
+            )
+    os.replace(dead_letter_tmp, dead_letter_file)
 
-    print(f"✅ Throttled scraping complete. Saved to {output_filename}")
+    print(f"✅ Throttled scraping complete. Saved {total} pages to {output_filename}")
+    print(f"⏳ Rate limiter waits: {rate_limiter.summary()}")
+    if controller:
+        controller.save_history()
+        print(f"⚙️ Final concurrency: {controller.summary()} ({len(controller.history)} changes in concurrency_history.json)")
+    if blocker:
+        print(f"🚫 Blocked {blocker.totals['requests']} requests (~{blocker.totals['bytes'] / 1e6:.1f} MB est.)")
+    if failures:
+        print(f"❌ {sum(failures.values())} URL(s) failed; re-run them with input_file='{dead_letter_file}'")
+        for category, count in failures.most_common():
+            print(f"   {category}: {count}")
 
 
 if __name__ == "__main__":
-    asyncio.run(scrape_filtered_urls_throttled(concurrency_limit=1))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--block-resources", action="store_true",
+                        help="skip images, fonts, media and trackers while scraping (only the card DOM is needed)")
+    args = parser.parse_args()
+    asyncio.run(scrape_filtered_urls_throttled(concurrency_limit=1, block_resources=args.block_resources))
@@ -12,7 +12,13 @@ from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
 from crawl4ai.deep_crawling.filters import FilterChain, URLPatternFilter
 # from crawl4ai.async_configs import RoundRobinProxyStrategy # Strategy for rotating proxies
 import re
-from bs4 import BeautifulSoup
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for crawl_common
+from crawl_common.readiness import SITE_READY_SELECTORS, format_readiness, readiness_wait
+from crawl_common.scroll import adaptive_scroll_js, format_scroll
+from crawl_common.rate_limit import HostRateLimiter
+from crawl_common.fragments import select_fragments
 
 # Define example proxy configurations
 # In a real-world scenario, you would load these securely from a file or environment variables.
@@ -135,22 +141,12 @@ async def crawlScrap():
         # ==============================================================================
         # BROWSER TIMING & DYNAMIC RENDERING
         # ==============================================================================
-        delay_before_return_html = 20.0,
-        mean_delay = 2.0,
-        max_range = 6.0,
+        wait_for = readiness_wait(SITE_READY_SELECTORS["mcmaster"]),
+        wait_for_timeout = 25000,
+        delay_before_return_html = 0.5,
         semaphore_count = 5,
-        js_code = """
-        (async () => {
-            for (let i = 0; i < 10; i++) {
-                window.scrollBy(0, window.innerHeight);
-                await new Promise(r => setTimeout(r, 1500));
-            }
-            return true;
-        })();
-        """,
-        scan_full_page = True,
-        scroll_delay = 2,
-        max_scroll_steps = 20,
+        js_code = adaptive_scroll_js(SITE_READY_SELECTORS["mcmaster"], step_delay_ms=1500),
+        scan_full_page = False,
         process_iframes = False,
         remove_overlay_elements = True,
         simulate_user = True,
@@ -181,7 +177,9 @@ async def crawlScrap():
         experimental = {},
     )
 
+    rate_limiter = HostRateLimiter()
     async with AsyncWebCrawler(config=browser_config) as crawler:
+        rate_limiter.attach(crawler)  # per-host budget from crawl_common.rate_limit
         results = await crawler.arun(
             url="https://www.mcmaster.com/socket-head-screws-2~/socket-head-screws-2~/alloy-steel-socket-head-screws-8/",
             config=run_config,
@@ -195,19 +193,18 @@ async def crawlScrap():
             with open("markdown.md", "w", encoding="utf-8") as m, open("filtered_urls.txt", "w", encoding="utf-8") as f:
                 for i, result in enumerate(results, start=1):
                     if hasattr(result, "url") and result.url:
-                        print(f"✅ [{i}/{total}] Found: {result.url}")
+                        print(f"✅ [{i}/{total}] Found: {result.url} ({format_readiness(result.html)}; {format_scroll(result.html)})")
                         f.write(result.url + "\n")
                     if hasattr(result, "html") and result.html:
                         html = result.html
                         print(html)
-                        soup = BeautifulSoup(html, "html.parser")
-
-                        divs = soup.find_all("div", class_="hz")
+                        # Only the matching divs are written out; the page is never parsed into a tree
+                        divs = select_fragments(html, "div.hz")
 
                         content = ""
                         if divs:
                             for div in divs:
-                                content += str(div) + "\n\n"
+                                content += div + "\n\n"
                         else:
                             print(f"⚠️ No <div class='hz'> found in {result.url}")
                         m.write(content + "\n\n---\n\n")
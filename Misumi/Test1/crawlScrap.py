@@ -12,7 +12,13 @@ from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
 from crawl4ai.deep_crawling.filters import FilterChain, URLPatternFilter
 # from crawl4ai.async_configs import RoundRobinProxyStrategy # Strategy for rotating proxies
 import re
-from bs4 import BeautifulSoup
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.readiness import SITE_READY_SELECTORS, format_readiness, readiness_wait
+from crawl_common.scroll import adaptive_scroll_js, format_scroll
+from crawl_common.rate_limit import HostRateLimiter
+from crawl_common.fragments import select_fragments
 
 # Define example proxy configurations
 # In a real-world scenario, you would load these securely from a file or environment variables.
@@ -135,22 +141,12 @@ async def crawlScrap():
         # ==============================================================================
         # BROWSER TIMING & DYNAMIC RENDERING
         # ==============================================================================
-        delay_before_return_html = 20.0,
-        mean_delay = 2.0,
-        max_range = 6.0,
+        wait_for = readiness_wait(SITE_READY_SELECTORS["misumi"]),
+        wait_for_timeout = 25000,
+        delay_before_return_html = 0.5,
         semaphore_count = 5,
-        js_code = """
-        (async () => {
-            for (let i = 0; i < 10; i++) {
-                window.scrollBy(0, window.innerHeight);
-                await new Promise(r => setTimeout(r, 1500));
-            }
-            return true;
-        })();
-        """,
-        scan_full_page = True,
-        scroll_delay = 2,
-        max_scroll_steps = 20,
+        js_code = adaptive_scroll_js(SITE_READY_SELECTORS["misumi"], step_delay_ms=1500),
+        scan_full_page = False,
         process_iframes = False,
         remove_overlay_elements = True,
         simulate_user = True,
@@ -181,7 +177,9 @@ async def crawlScrap():
         experimental = {},
     )
 
+    rate_limiter = HostRateLimiter()
     async with AsyncWebCrawler(config=browser_config) as crawler:
+        rate_limiter.attach(crawler)  # per-host budget from crawl_common.rate_limit
         results = await crawler.arun(
             url="https://us.misumi-ec.com/vona2/detail/110302634310/?list=PageCategory&Tab=wysiwyg_area_1&curSearch=%7B%22field%22%3A%22%40search%22%2C%22seriesCode%22%3A%22110302634310%22%2C%22innerCode%22%3A%22%22%2C%22sort%22%3A1%2C%22specSortFlag%22%3A0%2C%22allSpecFlag%22%3A0%2C%22page%22%3A1%2C%22pageSize%22%3A%2260%22%7D",
             config=run_config,
@@ -197,15 +195,15 @@ async def crawlScrap():
             with open("markdown.md", "w", encoding="utf-8") as m:
                 for i, result in enumerate(results, start=1):
                     if hasattr(result, "url") and result.url:
-                        print(f"✅ [{i}/{total}] Processing: {result.url}")
+                        print(f"✅ [{i}/{total}] Processing: {result.url} ({format_readiness(result.html)}; {format_scroll(result.html)})")
 
                     if hasattr(result, "html") and result.html:
                         html = result.html
-                        soup = BeautifulSoup(html, "html.parser")
 
                         # --- MODIFICATION START ---
-                        # Select only <table> elements within the .l-adaptive-content container
-                        tables = soup.select(".l-adaptive-content table")
+                        # Select only <table> elements within the .l-adaptive-content container,
+                        # without parsing the whole page into a tree
+                        tables = select_fragments(html, ".l-adaptive-content table")
 
                         content = ""
 
@@ -214,7 +212,7 @@ async def crawlScrap():
                             print(f"   Found {len(tables)} table(s). Storing...")
                             for table in tables:
                                 # Store the complete HTML of the table
-                                content += str(table) + "\n\n"
+                                content += table + "\n\n"
                         else:
                             print(f"⚠️ No matching <table> found in {result.url}")
                         # --- MODIFICATION END ---
@@ -5,6 +5,11 @@ from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 import pandas as pd
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.llm_cache import LLMCache
+from crawl_common.tables import normalize_table
 
 # ----------------------------------------
 # 1️⃣ Load environment and setup Gemini
@@ -16,6 +21,11 @@ if not api_token:
 
 client = genai.Client(api_key=api_token)
 
+MODEL = "gemini-2.5-flash"
+# Bump whenever the prompt changes, so cached results from the old prompt are not reused
+PROMPT_VERSION = "table-v1"
+LLM_CACHE_FILE = ".llm_cache.sqlite"
+
 
 # ----------------------------------------
 # 2️⃣ Main extraction logic
@@ -36,10 +46,19 @@ def extract_html_tables_from_markdown():
         return
 
     OUTPUT_FILE = "html_tables_extracted.jsonl"
+    cache = LLMCache(LLM_CACHE_FILE)
+    native_count = 0
 
     for idx, table_html in enumerate(tables, start=1):
         print(f"\n🚀 Processing table {idx}...")
 
+        # Tables with an unambiguous grid are normalized locally; only the rest go to Gemini
+        native_data, ambiguity = normalize_table(table_html, idx)
+        if ambiguity:
+            print(f"🤖 Table {idx} is ambiguous ({ambiguity}); falling back to Gemini.")
+        else:
+            native_count += 1
+
         # ----------------------------------------
         # 4️⃣ Gemini Prompt
         # ----------------------------------------
@@ -69,24 +88,37 @@ def extract_html_tables_from_markdown():
         """
 
         # ----------------------------------------
-        # 5️⃣ Send to Gemini
+        # 5️⃣ Send to Gemini (unchanged tables come from the cache)
         # ----------------------------------------
+        table_data = native_data
         try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config=types.GenerateContentConfig(response_mime_type="application/json"),
-            )
-
-            raw_json = response.text.strip()
-
-            try:
-                table_data = json.loads(raw_json)
-            except Exception as parse_err:
-                print(f"⚠️ Table {idx} JSON parse error: {parse_err}")
-                with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
-                    f.write(json.dumps({"table_index": idx, "raw": raw_json}, ensure_ascii=False) + "\n")
-                continue
+            if table_data is None:
+                # Anything but a table object (the model may have answered with a list or string) is a miss
+                cached = cache.get(MODEL, PROMPT_VERSION, table_html)
+                if isinstance(cached, dict):
+                    table_data = {**cached, "table_index": idx}
+                    print(f"♻️ Table {idx} served from the LLM cache.")
+
+            if table_data is None:
+                response = client.models.generate_content(
+                    model=MODEL,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(response_mime_type="application/json"),
+                )
+
+                raw_json = response.text.strip()
+
+                try:
+                    table_data = json.loads(raw_json)
+                except Exception as parse_err:
+                    print(f"⚠️ Table {idx} JSON parse error: {parse_err}")
+                    with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"table_index": idx, "raw": raw_json}, ensure_ascii=False) + "\n")
+                    continue
+
+                if isinstance(table_data, dict):
+                    cache.put(MODEL, PROMPT_VERSION, table_html, table_data)
+                    cache.commit()
 
             # ----------------------------------------
             # 6️⃣ Save JSON and CSV
@@ -103,6 +135,11 @@ def extract_html_tables_from_markdown():
         except Exception as e:
             print(f"❌ Failed to process table {idx}: {e}")
 
+    stats = cache.stats()
+    cache.close()
+    print(f"\n🧮 {native_count} of {len(tables)} tables normalized locally without Gemini")
+    print(f"\n♻️ LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+
 
 # ----------------------------------------
 # 7️⃣ Entry Point
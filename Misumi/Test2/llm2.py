@@ -1,12 +1,18 @@
 import os
 import json
 import re
-import html
-from bs4 import BeautifulSoup
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 import pandas as pd
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for crawl_common
+from crawl_common.llm_cache import LLMCache
+from crawl_common.tables import extract_page_tables, normalize_table, split_table_rows
+from crawl_common.preprocess import format_cpu_stats, parallel_map
+from crawl_common.tokens import TokenCounter, pack_records
+from crawl_common.compact import compact_html
 
 # ============================================================
 # 1️⃣ Setup
@@ -18,39 +24,42 @@ if not api_token:
 
 client = genai.Client(api_key=api_token)
 
+MODEL = "gemini-2.5-flash"
+# Bump whenever the prompt changes, so cached results from the old prompt are not reused
+PROMPT_VERSION = "table-batch-v2"
+LLM_CACHE_FILE = ".llm_cache.sqlite"
+# Prompt tokens per request, instructions included; well below the ~128k context
+BATCH_TOKEN_CEILING = 80_000
+TABLE_SEPARATOR = "\n\n---TABLE-SEPARATOR---\n\n"
+# crawlScrap.py ends every page's tables with this line
+PAGE_SEPARATOR = "\n\n---\n\n"
+
 # ============================================================
 # 2️⃣ Utilities
 # ============================================================
-def clean_html(html_text: str) -> str:
-    """Decode and remove irrelevant tags like script/style."""
-    cleaned = html.unescape(html_text)
-    soup = BeautifulSoup(cleaned, "html.parser")
-    for tag in soup(["script", "style", "svg", "noscript"]):
-        tag.decompose()
-    return str(soup)
-
-def extract_tables(html_content: str):
-    """Extract all <table>...</table> blocks including nested."""
-    soup = BeautifulSoup(html_content, "html.parser")
-    return [str(t) for t in soup.find_all("table")]
-
-def estimate_tokens(text: str) -> int:
-    """
-    Rough token estimate for Gemini (1 token ≈ 4 chars typical).
-    Safe upper bound.
-    """
-    return len(text) // 4
+def save_table(t, output_file, fallback_index):
+    """Append one parsed table to the JSONL output and write its CSV."""
+    with open(output_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(t, ensure_ascii=False) + "\n")
+    if "rows" in t and isinstance(t["rows"], list) and t["rows"]:
+        df = pd.DataFrame(t["rows"])
+        csv_name = f"table_{t.get('table_index', fallback_index)}.csv"
+        df.to_csv(csv_name, index=False, encoding="utf-8")
+        print(f"✅ Saved {csv_name} ({len(df)} rows)")
 
 # ============================================================
 # 3️⃣ Main Extraction
 # ============================================================
-def extract_html_tables_from_markdown():
+def extract_html_tables_from_markdown(workers=None):
     # Load scraped file
     with open("markdown.md", "r", encoding="utf-8") as f:
         content = f.read()
 
-    cleaned = clean_html(content)
-    tables = extract_tables(cleaned)
+    # Each page is cleaned and its tables extracted in one parse, pages spread over all cores
+    pages = [page for page in content.split(PAGE_SEPARATOR) if page.strip()]
+    page_tables, cpu_stats = parallel_map(extract_page_tables, pages, workers=workers)
+    tables = [table_html for found in page_tables for table_html in found]
+    print(f"⚙️ Preprocessing: {format_cpu_stats(cpu_stats)}")
     print(f"🔍 Found {len(tables)} tables (including nested).")
 
     if not tables:
@@ -58,40 +67,100 @@ def extract_html_tables_from_markdown():
         return
 
     OUTPUT_JSONL = "tables_extracted_safe.jsonl"
-    MAX_TOKENS = 100000  # Keep below Gemini 2.5 Flash limit (~128k)
-
-    batch, batch_tokens = [], 0
-    batch_index, table_index = 0, 1
 
-    for table_html in tables:
-        tokens = estimate_tokens(table_html)
-        if tokens > MAX_TOKENS * 0.8:
-            print(f"⚠️ Table {table_index} too large ({tokens} tokens). Skipping.")
-            table_index += 1
+    counter = TokenCounter(MODEL)
+    # Room left for tables once the instructions are counted
+    table_budget = BATCH_TOKEN_CEILING - counter.count(build_prompt(""))
+    separator_tokens = counter.count(TABLE_SEPARATOR)
+    cache = LLMCache(LLM_CACHE_FILE)
+    native_count = 0
+
+    # Oversized tables are split at row boundaries; every part keeps its table's index
+    parts = []  # (table_index, part_no, part_html)
+    part_counts = {}
+    for table_index, table_html in enumerate(tables, start=1):
+        # Tables with an unambiguous grid are normalized locally; only the rest are batched
+        native, ambiguity = normalize_table(table_html, table_index)
+        if native is not None:
+            save_table(native, OUTPUT_JSONL, table_index)
+            native_count += 1
             continue
-
-        # Add to batch if safe
-        if batch_tokens + tokens < MAX_TOKENS * 0.8:
-            batch.append(table_html)
-            batch_tokens += tokens
+        print(f"🤖 Table {table_index} is ambiguous ({ambiguity}); queued for Gemini.")
+
+        table_parts = split_table_rows(table_html, table_budget - separator_tokens, counter.count)
+        if len(table_parts) > 1:
+            print(f"✂️ Table {table_index} exceeds the batch ceiling; split into {len(table_parts)} parts at row boundaries.")
+        parts.extend((table_index, part_no, part_html) for part_no, part_html in enumerate(table_parts))
+        part_counts[table_index] = len(table_parts)
+
+    received = {}  # table_index -> {part_no: parsed part}
+
+    def merge(table_index):
+        """One table from the parts received so far, with their rows joined in order."""
+        ordered = [received[table_index][n] for n in sorted(received[table_index])]
+        merged = dict(ordered[0])
+        merged["table_index"] = table_index
+        if part_counts[table_index] > 1:
+            merged["rows"] = [row for part in ordered for row in part.get("rows") or []]
+        return merged
+
+    def collect(table_index, part_no, t):
+        """Save a table once all of its parts are parsed."""
+        received.setdefault(table_index, {})[part_no] = t
+        if len(received[table_index]) == part_counts[table_index]:
+            save_table(merge(table_index), OUTPUT_JSONL, table_index)
+
+    # Gemini gets compacted tables (no styling attributes, collapsed whitespace);
+    # unchanged ones come from the cache and never reach the model
+    queued, raw_tokens = [], []
+    for table_index, part_no, part_html in parts:
+        compacted = compact_html(part_html, keep_class="header")
+        cached = cache.get(MODEL, PROMPT_VERSION, compacted)
+        # Anything but a table object (the model may have answered with a list or string) is a miss
+        if isinstance(cached, dict):
+            print(f"♻️ Table {table_index} (part {part_no + 1}) served from the LLM cache.")
+            collect(table_index, part_no, cached)
         else:
-            # Process current batch before overflow
-            process_batch(batch, batch_index, table_index, OUTPUT_JSONL)
-            batch, batch_tokens = [table_html], tokens
-            batch_index += 1
-        table_index += 1
-
-    # Process last batch
-    if batch:
-        process_batch(batch, batch_index, table_index, OUTPUT_JSONL)
+            queued.append((table_index, part_no, compacted))
+            raw_tokens.append(counter.count(part_html) + separator_tokens)
+
+    sizes = [(i, counter.count(part_html) + separator_tokens) for i, (_, _, part_html) in enumerate(queued)]
+    batches = pack_records(sizes, table_budget)
+    print(f"📦 Packed {len(queued)} tables/parts ({sum(t for _, t in sizes)} tokens, counted "
+          f"{counter.describe()}) into {len(batches)} requests under {BATCH_TOKEN_CEILING} tokens.")
+    for batch_index, keys in enumerate(batches):
+        batch = [queued[k] for k in keys]
+        before, after = sum(raw_tokens[k] for k in keys), sum(sizes[k][1] for k in keys)
+        print(f"🗜️ Batch {batch_index+1}: {before} → {after} table tokens after compaction ({1 - after / before:.0%} saved)")
+        parsed = process_batch([part_html for _, _, part_html in batch], batch_index, OUTPUT_JSONL, cache, counter)
+        if parsed is not None:
+            for (table_index, part_no, _), t in zip(batch, parsed):
+                if isinstance(t, dict):
+                    collect(table_index, part_no, t)
+                    continue
+                print(f"⚠️ Table {table_index} (part {part_no + 1}) came back as a {type(t).__name__}, not a table; writing it raw.")
+                with open(OUTPUT_JSONL, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"table_index": table_index, "part": part_no + 1, "raw": t}, ensure_ascii=False) + "\n")
+
+    # A split table whose other parts failed keeps the rows that did come back, flagged with what is missing
+    for table_index, got in received.items():
+        if len(got) < part_counts[table_index]:
+            missing = [n + 1 for n in range(part_counts[table_index]) if n not in got]
+            print(f"⚠️ Table {table_index} is incomplete: part(s) {missing} of {part_counts[table_index]} failed; "
+                  f"saving the {len(got)} received.")
+            save_table({**merge(table_index), "missing_parts": missing}, OUTPUT_JSONL, table_index)
+
+    counter.save()
+    stats = cache.stats()
+    cache.close()
+    print(f"\n🧮 {native_count} of {len(tables)} tables normalized locally without Gemini")
+    print(f"\n♻️ LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
 
 # ============================================================
 # 4️⃣ Gemini Batch Processing
 # ============================================================
-def process_batch(batch, batch_index, start_index, output_file):
-    joined_tables = "\n\n---TABLE-SEPARATOR---\n\n".join(batch)
-
-    prompt = f"""
+def build_prompt(joined_tables):
+    return f"""
     You are a professional HTML table parser.
     Below are multiple HTML <table> elements separated by '---TABLE-SEPARATOR---'.
 
@@ -114,15 +183,27 @@ def process_batch(batch, batch_index, start_index, output_file):
     {joined_tables}
     """
 
+def process_batch(batch, batch_index, output_file, cache=None, counter=None):
+    """
+    Parse one batch of tables with Gemini.
+
+    Returns the parsed tables when they line up one-to-one with `batch`;
+    otherwise writes whatever came back to `output_file` and returns None.
+    """
+    prompt = build_prompt(TABLE_SEPARATOR.join(batch))
+
     print(f"\n🚀 Sending batch {batch_index+1} with {len(batch)} tables to Gemini...")
 
     try:
         response = client.models.generate_content(
-            model="gemini-2.5-flash",
+            model=MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(response_mime_type="application/json"),
         )
         raw_json = response.text.strip()
+        usage = response.usage_metadata
+        if counter is not None and usage and usage.prompt_token_count:
+            counter.observe(prompt, usage.prompt_token_count)
 
         try:
             parsed = json.loads(raw_json)
@@ -130,20 +211,24 @@ def process_batch(batch, batch_index, start_index, output_file):
             print(f"⚠️ Batch {batch_index+1} JSON parse failed: {e}")
             with open(output_file, "a", encoding="utf-8") as f:
                 f.write(json.dumps({"batch": batch_index+1, "raw": raw_json}, ensure_ascii=False) + "\n")
-            return
-
-        # Write to JSONL and CSV
-        with open(output_file, "a", encoding="utf-8") as f:
-            for t in parsed:
-                f.write(json.dumps(t, ensure_ascii=False) + "\n")
-                if "rows" in t and isinstance(t["rows"], list) and t["rows"]:
-                    df = pd.DataFrame(t["rows"])
-                    csv_name = f"table_{t.get('table_index', start_index)}.csv"
-                    df.to_csv(csv_name, index=False, encoding="utf-8")
-                    print(f"✅ Saved {csv_name} ({len(df)} rows)")
+            return None
+
+        # Results can only be cached and merged per table when they line up one-to-one with the input
+        if isinstance(parsed, list) and len(parsed) == len(batch):
+            if cache is not None:
+                for table_html, t in zip(batch, parsed):
+                    if isinstance(t, dict):
+                        cache.put(MODEL, PROMPT_VERSION, table_html, t)
+                cache.commit()
+            return parsed
+
+        print(f"⚠️ Batch {batch_index+1} returned {len(parsed) if isinstance(parsed, list) else 1} tables for {len(batch)} inputs; saving as returned.")
+        for t in parsed if isinstance(parsed, list) else [parsed]:
+            save_table(t, output_file, batch_index)
 
     except Exception as e:
         print(f"❌ Gemini call failed for batch {batch_index+1}: {e}")
+    return None
 
 # ============================================================
 # 5️⃣ Run
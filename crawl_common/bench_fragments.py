@@ -0,0 +1,112 @@
+"""
+Benchmarks the ``fragments`` engines on saved pages.
+
+    python -m crawl_common.bench_fragments pages/ --selector "div.Ms6aG"
+
+Each engine runs on each page in a fresh forked child, so the peak memory
+of one run never hides another's. Output per page and engine: wall time,
+peak memory above the page already in memory, match count, and whether the
+matches equal the full bs4 parse.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from crawl_common.fragments import ENGINES, select_fragments
+
+
+def _rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:  # no procfs: the peak so far is the closest baseline
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run(conn, html: str, selector: str, engine: str) -> None:
+    base = _rss()
+    start = time.perf_counter()
+    fragments = select_fragments(html, selector, engine)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
+    conn.send({"ms": 1000 * elapsed, "peak_mb": max(0, peak - base) / 2**20, "fragments": fragments})
+    conn.close()
+
+
+def measure(html: str, selector: str, engine: str) -> Dict[str, object]:
+    """
+    Runs one engine on one page in a forked child.
+
+    Args:
+        html (str): The page HTML.
+        selector (str): The selector.
+        engine (str): One of ``ENGINES``.
+
+    Returns:
+        Dict[str, object]: ``ms``, ``peak_mb`` and the ``fragments``.
+    """
+    context = multiprocessing.get_context("fork")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_run, args=(child, html, selector, engine))
+    process.start()
+    child.close()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def bench(paths: List[Path], selector: str, engines: List[str]) -> bool:
+    """
+    Prints one line per page and engine, then totals per engine.
+
+    Args:
+        paths (List[Path]): The pages.
+        selector (str): The selector.
+        engines (List[str]): The engines; ``bs4`` always runs as the reference.
+
+    Returns:
+        bool: Whether every engine matched the reference on every page.
+    """
+    engines = ["bs4"] + [e for e in engines if e != "bs4"]
+    totals = {engine: {"ms": 0.0, "peak_mb": 0.0, "mismatches": 0} for engine in engines}
+    for path in paths:
+        html = path.read_text(encoding="utf-8", errors="replace")
+        reference = None
+        for engine in engines:
+            result = measure(html, selector, engine)
+            reference = reference if reference is not None else result["fragments"]
+            same = result["fragments"] == reference
+            totals[engine]["ms"] += result["ms"]
+            totals[engine]["peak_mb"] = max(totals[engine]["peak_mb"], result["peak_mb"])
+            totals[engine]["mismatches"] += not same
+            print(f"{path.name:<30} {engine:<9} {result['ms']:>8.1f} ms {result['peak_mb']:>7.1f} MB "
+                  f"{len(result['fragments']):>5} matches {'✅' if same else '❌ differs from bs4'}")
+
+    print(f"\n📊 {len(paths)} pages, selector {selector!r}")
+    for engine, total in totals.items():
+        speedup = totals["bs4"]["ms"] / total["ms"] if total["ms"] else 0.0
+        print(f"   {engine:<9} {total['ms']:>9.1f} ms total ({speedup:.1f}x), peak {total['peak_mb']:.1f} MB, "
+              f"{total['mismatches']} pages differ")
+    return all(total["mismatches"] == 0 for total in totals.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", type=Path, help="HTML files, or directories of *.html files")
+    parser.add_argument("--selector", required=True, help="e.g. 'div.Ms6aG' or '.l-adaptive-content table'")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.paths:
+        pages.extend(sorted(path.glob("*.html")) if path.is_dir() else [path])
+    if not pages:
+        parser.error("no HTML pages found")
+    raise SystemExit(0 if bench(pages, args.selector, args.engines) else 1)
+
+
+if __name__ == "__main__":
+    main()
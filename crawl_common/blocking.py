@@ -0,0 +1,176 @@
+import re
+import weakref
+from collections import Counter
+from fnmatch import fnmatch
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from crawl_common.hooks import add_hook
+
+# Rough transfer sizes per blocked resource type, used for the saved-bytes estimate
+ESTIMATED_BYTES = {
+    "image": 25_000,
+    "font": 40_000,
+    "media": 400_000,
+    "script": 30_000,
+    "xhr": 2_000,
+    "fetch": 2_000,
+    "other": 2_000,
+}
+
+# Analytics and tracking hosts that never contribute to the DOM we scrape
+TRACKER_DOMAINS = [
+    "*google-analytics.com",
+    "*googletagmanager.com",
+    "*doubleclick.net",
+    "*facebook.net",
+    "*connect.facebook.com",
+    "*hotjar.com",
+    "*mmstat.com",
+    "*arms-retcode.aliyuncs.com",
+    "*aplus*.alibaba.com",
+]
+
+# Opt-in profiles, per site. Image URLs stay in the DOM attributes; only the
+# downloads are skipped.
+BLOCK_PROFILES = {
+    "daraz": {
+        "resource_types": {"image", "font", "media"},
+        "domain_patterns": TRACKER_DOMAINS + ["*px.ads.linkedin.com", "*tiktok.com"],
+    },
+}
+
+_BLOCK_ATTRS = re.compile(
+    r'<html[^>]*?data-blocked-requests="(\d+)"[^>]*?data-blocked-bytes="(\d+)"',
+    re.IGNORECASE,
+)
+
+
+class ResourceBlocker:
+    """
+    Aborts browser requests by resource type and host pattern.
+
+    Attach it to a crawler with ``attach``; it routes every request of every
+    page through ``should_block``. Per-page counters are stamped on
+    ``<html>`` as ``data-blocked-*`` attributes before the HTML is captured,
+    so each ``CrawlResult.html`` carries them (see ``read_blocking``), and
+    ``totals`` adds them up over the whole run.
+    """
+
+    def __init__(self, resource_types: Iterable[str] = (), domain_patterns: Iterable[str] = ()):
+        self.resource_types = set(resource_types)
+        self.domain_patterns = list(domain_patterns)
+        self.page_counts = weakref.WeakKeyDictionary()
+        self.totals = Counter()
+
+    @classmethod
+    def for_site(cls, site: str) -> "ResourceBlocker":
+        """
+        Builds a blocker from one of the ``BLOCK_PROFILES``.
+
+        Args:
+            site (str): Profile name, e.g. ``"daraz"``.
+
+        Returns:
+            ResourceBlocker: The configured blocker.
+        """
+        return cls(**BLOCK_PROFILES[site])
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """
+        Decides whether a request is skipped.
+
+        Args:
+            resource_type (str): Playwright resource type (image, font, ...).
+            url (str): The request URL.
+
+        Returns:
+            bool: True if the request should be aborted.
+        """
+        if resource_type in self.resource_types:
+            return True
+        host = urlsplit(url).hostname or ""
+        return any(fnmatch(host, pattern) for pattern in self.domain_patterns)
+
+    def attach(self, crawler) -> None:
+        """
+        Registers the blocking hooks on a crawler's browser strategy.
+
+        Args:
+            crawler (AsyncWebCrawler): The crawler whose pages are filtered.
+        """
+        add_hook(crawler, "on_page_context_created", self._on_page_created)
+        add_hook(crawler, "before_goto", self._before_goto)
+        add_hook(crawler, "before_retrieve_html", self._stamp)
+        try:
+            # Runs after js_code, so requests made while scrolling are counted too
+            add_hook(crawler, "on_execution_ended", self._stamp)
+        except ValueError:
+            pass
+
+    async def _on_page_created(self, page, context=None, **kwargs):
+        async def handle(route):
+            request = route.request
+            if self.should_block(request.resource_type, request.url):
+                counts = self.page_counts.setdefault(page, Counter())
+                counts["requests"] += 1
+                counts["bytes"] += ESTIMATED_BYTES.get(request.resource_type, ESTIMATED_BYTES["other"])
+                self.totals["requests"] += 1
+                self.totals["bytes"] += ESTIMATED_BYTES.get(request.resource_type, ESTIMATED_BYTES["other"])
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await page.route("**/*", handle)
+        return page
+
+    async def _before_goto(self, page, context=None, **kwargs):
+        # Session pages are reused, so counters start over on each navigation
+        self.page_counts[page] = Counter()
+        return page
+
+    async def _stamp(self, page, context=None, **kwargs):
+        counts = self.page_counts.get(page, Counter())
+        await page.evaluate(
+            """([requests, bytes]) => {
+                document.documentElement.setAttribute("data-blocked-requests", String(requests));
+                document.documentElement.setAttribute("data-blocked-bytes", String(bytes));
+            }""",
+            [counts["requests"], counts["bytes"]],
+        )
+        return page
+
+
+def read_blocking(html: Optional[str]) -> Optional[dict]:
+    """
+    Reads the blocking counters left on ``<html>`` by ``ResourceBlocker``.
+
+    Args:
+        html (Optional[str]): The rendered HTML of the page.
+
+    Returns:
+        Optional[dict]: ``{"requests", "bytes"}``, or None when the page was
+        rendered without a blocker.
+    """
+    if not html:
+        return None
+    match = _BLOCK_ATTRS.search(html[:4096])
+    if not match:
+        return None
+    return {"requests": int(match.group(1)), "bytes": int(match.group(2))}
+
+
+def format_blocking(html: Optional[str]) -> str:
+    """
+    Formats the blocking counters of a page for the crawl log.
+
+    Args:
+        html (Optional[str]): The rendered HTML of the page.
+
+    Returns:
+        str: A short summary such as ``blocked 84 requests (~2.1 MB est.)``.
+    """
+    blocked = read_blocking(html)
+    if blocked is None:
+        return "no blocking"
+    return f"blocked {blocked['requests']} requests (~{blocked['bytes'] / 1e6:.1f} MB est.)"
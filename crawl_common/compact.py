@@ -0,0 +1,177 @@
+import hashlib
+import re
+from typing import Dict, Optional, Union
+
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+# Attributes that carry meaning for extraction; everything else (obfuscated
+# classes, inline styles, sizes, data-* tracking) is dropped
+SEMANTIC_ATTRS = {"href", "src", "data-src", "alt", "title", "colspan", "rowspan", "headers", "scope", "datetime"}
+NOISE_TAGS = ["script", "style", "svg", "noscript", "template", "iframe"]
+# Elements that mean something even when empty
+VOID_TAGS = {"img", "br", "hr", "input", "td", "th", "tr"}
+# Repeated rows and list items are data, never boilerplate
+DATA_TAGS = {"table", "thead", "tbody", "tfoot", "tr", "td", "th", "li", "dt", "dd"}
+# Shorter URLs cost fewer tokens than their short IDs are worth
+MIN_URL_LENGTH = 24
+MIN_REPEATS = 3
+# The model may prefix a scheme to an ID, e.g. "https:@1a2b3c"
+_SHORT_ID = re.compile(r"(https?:(?://)?)?(@[0-9a-f]{6,})")
+
+
+class UrlTable:
+    """
+    Reversible short IDs for long URLs.
+
+    A URL becomes ``@`` plus the start of its SHA-1, so the same URL gets the
+    same ID in every record, batch and run (cache keys stay stable).
+    ``restore`` puts the original URLs back into extracted values.
+    """
+
+    def __init__(self):
+        self.urls: Dict[str, str] = {}
+
+    def shorten(self, url: str) -> str:
+        if len(url) < MIN_URL_LENGTH:
+            return url
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        length = 6
+        while self.urls.get("@" + digest[:length], url) != url:
+            length += 1
+        short_id = "@" + digest[:length]
+        self.urls[short_id] = url
+        return short_id
+
+    def merge(self, urls: Dict[str, str], text: str) -> str:
+        """
+        Adds the URLs of another table, e.g. one record's, and rewrites its text.
+
+        Tables are filled independently, so two of them can give different
+        URLs the same ID; here such a URL is shortened again against this
+        table, and its ID in ``text`` changed to match.
+
+        >>> a, b = UrlTable(), UrlTable()
+        >>> a.shorten("https://www.daraz.com.np/products/item-2558.html")
+        '@7e2ab3'
+        >>> b.shorten("https://www.daraz.com.np/products/item-3024.html")
+        '@7e2ab3'
+        >>> shared = UrlTable()
+        >>> shared.merge(a.urls, "[x](@7e2ab3)"), shared.merge(b.urls, "[y](@7e2ab3)")
+        ('[x](@7e2ab3)', '[y](@7e2ab3c)')
+        >>> shared.restore(["@7e2ab3", "@7e2ab3c"])
+        ['https://www.daraz.com.np/products/item-2558.html', 'https://www.daraz.com.np/products/item-3024.html']
+
+        Args:
+            urls (Dict[str, str]): URL by short ID, as in ``UrlTable.urls``.
+            text (str): Text using those IDs.
+
+        Returns:
+            str: ``text`` with this table's IDs.
+        """
+        ids = {short_id: self.shorten(url) for short_id, url in urls.items()}
+        if all(old == new for old, new in ids.items()):
+            return text
+        return _SHORT_ID.sub(lambda m: (m.group(1) or "") + ids.get(m.group(2), m.group(2)), text)
+
+    def _expand(self, match: re.Match) -> str:
+        scheme, short_id = match.groups()
+        url = self.urls.get(short_id)
+        if url is None:
+            return match.group(0)
+        if scheme and url.startswith("//"):
+            return scheme.rstrip("/") + url
+        return url
+
+    def restore(self, value):
+        """
+        Replaces short IDs with their URLs, recursing into lists and dicts.
+
+        Args:
+            value: An extracted value or object.
+
+        Returns:
+            The value with every known short ID restored.
+        """
+        if isinstance(value, str):
+            return _SHORT_ID.sub(self._expand, value)
+        if isinstance(value, list):
+            return [self.restore(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self.restore(v) for k, v in value.items()}
+        return value
+
+
+def _collapse_repeats(parent: Tag) -> None:
+    children = [c for c in parent.children if isinstance(c, Tag) or str(c).strip()]
+    i = 0
+    while i < len(children):
+        child = children[i]
+        run = 1
+        while (
+            isinstance(child, Tag) and child.name not in DATA_TAGS and i + run < len(children)
+            and str(children[i + run]) == str(child)
+        ):
+            run += 1
+        if run >= MIN_REPEATS:
+            for duplicate in children[i + 1:i + run]:
+                duplicate.extract()
+            child.insert_after(NavigableString(f"×{run}"))
+        i += run
+
+
+def compact_html(html: Union[str, BeautifulSoup], urls: Optional[UrlTable] = None, keep_class: Optional[str] = None) -> str:
+    """
+    Shrinks HTML to what an LLM needs to extract data from it.
+
+    Drops comments, scripts and styles, every attribute outside
+    ``SEMANTIC_ATTRS``, and elements left empty. Whitespace is collapsed, and
+    runs of ``MIN_REPEATS`` or more identical siblings (icons, spacers) become
+    one copy followed by ``×n``. Table rows, cells and list items are never
+    collapsed.
+
+    Args:
+        html (str | BeautifulSoup): The record HTML, or its parsed tree,
+            which is then compacted in place.
+        urls (UrlTable, optional): Table that long ``href``/``src`` values are
+            shortened into; left as they are without one.
+        keep_class (str, optional): Regex of class names worth keeping, e.g.
+            ``"header"`` for tables that mark header cells by class.
+
+    Returns:
+        str: The compacted HTML.
+    """
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, "html.parser")
+    for comment in soup.find_all(string=lambda s: isinstance(s, Comment)):
+        comment.extract()
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+
+    for tag in soup.find_all(True):
+        classes = [c for c in tag.get("class", []) if keep_class and re.search(keep_class, c, re.I)]
+        tag.attrs = {k: v for k, v in tag.attrs.items() if k in SEMANTIC_ATTRS}
+        if classes:
+            tag["class"] = classes
+        if urls is not None:
+            for attr in ("href", "src", "data-src"):
+                if isinstance(tag.get(attr), str):
+                    tag[attr] = urls.shorten(tag[attr])
+        # A title repeating the element's own text says nothing new
+        if tag.get("title") and tag["title"].strip() == tag.get_text(strip=True):
+            del tag["title"]
+        if tag.get("colspan") == "1":
+            del tag["colspan"]
+        if tag.get("rowspan") == "1":
+            del tag["rowspan"]
+
+    # Deepest first, so wrappers emptied by their children go too
+    for tag in reversed(soup.find_all(True)):
+        if tag.name not in VOID_TAGS and not tag.attrs and not tag.get_text(strip=True) and not tag.find(True):
+            tag.decompose()
+
+    for text in soup.find_all(string=True):
+        collapsed = re.sub(r"\s+", " ", text)
+        if collapsed != text:
+            text.replace_with(collapsed)
+    for tag in [soup, *soup.find_all(True)]:
+        _collapse_repeats(tag)
+    return str(soup).strip()
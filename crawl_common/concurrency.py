@@ -0,0 +1,181 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+# Outcomes that mean the host is pushing back: cut the limit right away
+BACKOFF_OUTCOMES = {"throttled", "timeout", "blocked"}
+
+
+class _HostState:
+    def __init__(self, limit: float, window: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.samples = deque(maxlen=window)
+        self.last_cut = 0.0
+        self.condition = asyncio.Condition()
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency controller, one limit per host.
+
+    While the p95 latency and the error rate of the last ``window`` requests
+    stay within their targets, the limit grows additively, by about
+    ``increase`` per round of ``limit`` completed requests. A 429, timeout
+    or block page cuts it multiplicatively by ``decrease``; requests that
+    started before the cut cannot trigger a second one. Every change is
+    appended to ``history`` for post-run analysis.
+    """
+
+    def __init__(
+        self,
+        initial: float = 2,
+        minimum: float = 1,
+        maximum: float = 16,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_target_s: float = 20.0,
+        error_target: float = 0.1,
+        window: int = 20,
+    ):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target_s = latency_target_s
+        self.error_target = error_target
+        self.window = window
+        self.hosts: Dict[str, _HostState] = {}
+        self.history = []
+        self.started = time.monotonic()
+
+    def _state(self, host: str) -> _HostState:
+        if host not in self.hosts:
+            self.hosts[host] = _HostState(self.initial, self.window)
+        return self.hosts[host]
+
+    def limit(self, url_or_host: str) -> int:
+        """
+        Returns the current number of parallel requests allowed for a host.
+
+        Args:
+            url_or_host (str): A URL or a bare host name.
+
+        Returns:
+            int: The current limit.
+        """
+        host = urlsplit(url_or_host).hostname or url_or_host
+        return max(1, math.floor(self._state(host).limit))
+
+    async def acquire(self, url: str) -> tuple:
+        """
+        Waits for a free slot on the host of ``url``.
+
+        Args:
+            url (str): The URL about to be requested.
+
+        Returns:
+            tuple: A token to pass to ``release``.
+        """
+        host = urlsplit(url).hostname or ""
+        state = self._state(host)
+        async with state.condition:
+            await state.condition.wait_for(lambda: state.in_flight < max(1, math.floor(state.limit)))
+            state.in_flight += 1
+        return host, time.monotonic()
+
+    async def release(self, token: tuple, outcome: str) -> None:
+        """
+        Frees a slot and adapts the host limit to the request's outcome.
+
+        Args:
+            token (tuple): The token returned by ``acquire``.
+            outcome (str): ``"ok"``, ``"error"``, or one of ``BACKOFF_OUTCOMES``.
+        """
+        host, started = token
+        state = self._state(host)
+        latency = time.monotonic() - started
+        async with state.condition:
+            state.in_flight -= 1
+            state.samples.append((latency, outcome == "ok"))
+
+            if outcome in BACKOFF_OUTCOMES:
+                if started >= state.last_cut:
+                    self._set_limit(host, state, state.limit * self.decrease, outcome)
+                    state.last_cut = time.monotonic()
+                    state.samples.clear()
+            elif len(state.samples) >= min(self.window, 5):
+                # Errors count toward the error rate; only successes can raise the limit
+                p95, error_rate = self._health(state)
+                if outcome == "ok" and p95 <= self.latency_target_s and error_rate <= self.error_target:
+                    self._set_limit(host, state, state.limit + self.increase / state.limit, "healthy")
+                elif error_rate > self.error_target:
+                    self._set_limit(host, state, state.limit * self.decrease, "error_rate")
+                    state.last_cut = time.monotonic()
+                    state.samples.clear()
+            state.condition.notify_all()
+
+    def _health(self, state: _HostState) -> tuple:
+        latencies = sorted(latency for latency, _ in state.samples)
+        p95 = latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+        error_rate = sum(1 for _, ok in state.samples if not ok) / len(state.samples)
+        return p95, error_rate
+
+    def _set_limit(self, host: str, state: _HostState, limit: float, reason: str) -> None:
+        previous = math.floor(state.limit)
+        state.limit = min(self.maximum, max(self.minimum, limit))
+        # Only whole-number changes matter for scheduling; keep the history readable
+        if math.floor(state.limit) != previous:
+            p95, error_rate = self._health(state) if state.samples else (None, None)
+            self.history.append({
+                "t": round(time.monotonic() - self.started, 2),
+                "host": host,
+                "limit": math.floor(state.limit),
+                "reason": reason,
+                "p95_s": None if p95 is None else round(p95, 2),
+                "error_rate": None if error_rate is None else round(error_rate, 3),
+            })
+            print(f"⚙️ {host}: concurrency {previous} -> {math.floor(state.limit)} ({reason})")
+
+    def summary(self) -> str:
+        """
+        Formats the current limit of every host.
+
+        Returns:
+            str: e.g. ``www.daraz.com.np: 6``.
+        """
+        return ", ".join(f"{host}: {self.limit(host)}" for host in self.hosts) or "no requests"
+
+    def save_history(self, filename: str = "concurrency_history.json") -> None:
+        """
+        Writes the limit changes of the run to a JSON file.
+
+        Args:
+            filename (str): Output path.
+        """
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.history, f, indent=2)
+
+
+def outcome_for(category: Optional[str]) -> str:
+    """
+    Maps a scrape failure category to a controller outcome.
+
+    Args:
+        category (Optional[str]): None for success, else e.g. ``"timeout"`` or ``"http_429"``.
+
+    Returns:
+        str: The outcome to pass to ``AdaptiveConcurrency.release``.
+    """
+    if category is None:
+        return "ok"
+    if category in ("timeout", "blocked"):
+        return category
+    if category in ("http_429", "http_403", "http_503"):
+        return "throttled"
+    return "error"
@@ -0,0 +1,206 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from bs4 import BeautifulSoup
+
+# Query parameters that only track how a page was reached; they never change it
+TRACKING_PARAMS = {
+    "spm", "scm", "clickTrackInfo", "from", "src", "_keyori", "sugg", "search", "mp", "abbucket",
+    "ad_src", "asc", "pos", "fbclid", "gclid",
+}
+SIMHASH_BITS = 64
+# Near duplicates differ in at most this many SimHash bits
+MAX_DISTANCE = 3
+_NUMBERS = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalizes a URL so the same page always gets the same URL.
+
+    Shared by the HTML cache keys and record fingerprints: the scheme and host
+    are lowercased, the fragment, ``___pvid--<value>`` path segments and
+    tracking parameters (``TRACKING_PARAMS``, ``utm_*``, any ``*pvid*``) are
+    dropped, and the remaining parameters sorted.
+
+    Args:
+        url (str): The URL, possibly scheme-relative or relative.
+
+    Returns:
+        str: The URL a page is reached by no matter where the crawl came from.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith("utm_") and "pvid" not in k.lower()
+    )
+    path = re.sub(r"___pvid--[^_/?#]*", "", parts.path)
+    if parts.netloc:
+        return urlunsplit((parts.scheme.lower() or "https", parts.netloc.lower(), path or "/", urlencode(query), ""))
+    return urlunsplit((parts.scheme.lower(), "", path, urlencode(query), ""))
+
+
+def fingerprint(html: Union[str, BeautifulSoup]) -> Tuple[str, str, str]:
+    """
+    Reduces a record to what identifies its content.
+
+    Args:
+        html (str | BeautifulSoup): The record HTML or its parsed tree.
+
+    Returns:
+        Tuple[str, str, str]: A hash of the visible text plus canonical link
+        and image URLs (equal for exact duplicates), the visible text, and
+        the canonical link URLs joined.
+    """
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, "html.parser")
+    text = " ".join(soup.get_text(" ").split())
+    links = "\n".join(sorted({canonical_url(tag["href"]) for tag in soup.find_all(href=True)}))
+    images = sorted({canonical_url(tag["src"]) for tag in soup.find_all(src=True)})
+    key = hashlib.sha1("\n".join([text, links, *images]).encode("utf-8")).hexdigest()
+    return key, text, links
+
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> int:
+    """
+    SimHash of a text over its word 3-shingles.
+
+    Texts that share most shingles get hashes a few bits apart.
+
+    Args:
+        text (str): The text.
+        bits (int): Hash width.
+
+    Returns:
+        int: The hash.
+    """
+    words = text.lower().split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * bits
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=bits // 8).digest(), "big")
+        for bit in range(bits):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+
+class DedupIndex:
+    """
+    Incremental form of ``dedup_records``, for records that arrive in chunks.
+
+    Holds the fingerprint and SimHash bands of every representative added so
+    far (not their HTML), so a record can be matched against all earlier
+    chunks; see ``dedup_records`` for what counts as a duplicate.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.width = SIMHASH_BITS // self.bands
+        self.by_key: Dict[Tuple[Hashable, str], str] = {}
+        self.by_band: Dict[Tuple[Hashable, int, int], List[str]] = {}
+        self.hashes: Dict[str, int] = {}
+        self.identities: Dict[str, tuple] = {}
+        self._last = None  # the signature computed by the last find, reused by add
+
+    def _signature(self, text: str, links: str) -> Tuple[int, tuple]:
+        if self._last is None or self._last[0] != (text, links):
+            self._last = ((text, links), simhash(text), (_NUMBERS.findall(text), links))
+        return self._last[1], self._last[2]
+
+    def _band_keys(self, group: Hashable, h: int) -> List[Tuple[Hashable, int, int]]:
+        mask = (1 << self.width) - 1
+        return [(group, band, h >> band * self.width & mask) for band in range(self.bands)]
+
+    def find(self, fingerprint: Tuple[str, str, str], group: Hashable = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Looks up the representative a record duplicates.
+
+        A near duplicate's fingerprint is remembered, so its exact copies
+        match directly.
+
+        Args:
+            fingerprint (Tuple[str, str, str]): The record's ``fingerprint``.
+            group (Hashable, optional): Only records of the same group match.
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: The representative ID and
+            ``"exact"`` or ``"near"``, or (None, None) for a new record.
+        """
+        key, text, links = fingerprint
+        if (group, key) in self.by_key:
+            return self.by_key[(group, key)], "exact"
+        h, identity = self._signature(text, links)
+        for band_key in self._band_keys(group, h):
+            for candidate in self.by_band.get(band_key, []):
+                if self.identities[candidate] == identity and bin(self.hashes[candidate] ^ h).count("1") <= self.max_distance:
+                    self.by_key[(group, key)] = candidate
+                    return candidate, "near"
+        return None, None
+
+    def add(self, record_id: str, fingerprint: Tuple[str, str, str], group: Hashable = None) -> None:
+        """
+        Makes a record the representative later duplicates resolve to.
+
+        Args:
+            record_id (str): The record ID.
+            fingerprint (Tuple[str, str, str]): The record's ``fingerprint``.
+            group (Hashable, optional): The record's group.
+        """
+        key, text, links = fingerprint
+        h, identity = self._signature(text, links)
+        self.by_key[(group, key)] = record_id
+        self.hashes[record_id], self.identities[record_id] = h, identity
+        for band_key in self._band_keys(group, h):
+            self.by_band.setdefault(band_key, []).append(record_id)
+
+
+def dedup_records(
+    records: Dict[str, str],
+    groups: Optional[Dict[str, Hashable]] = None,
+    max_distance: int = MAX_DISTANCE,
+    fingerprints: Optional[Dict[str, Tuple[str, str, str]]] = None,
+) -> Tuple[List[str], Dict[str, List[str]], Counter]:
+    """
+    Finds exact and near-duplicate records so only one of each is extracted.
+
+    Exact duplicates share a ``fingerprint``, so revisits of a listing under
+    different tracking URLs collapse. Near duplicates have SimHashes at most
+    ``max_distance`` bits apart, exactly the same numbers (prices, counts,
+    ratings) and the same canonical links: the same listing differing only
+    in wording or images, e.g. lazy-load placeholders. Candidates are found
+    through ``max_distance + 1`` bands of the hash; by pigeonhole, hashes
+    that close share at least one band exactly.
+
+    Args:
+        records (Dict[str, str]): Record HTML by record ID, in input order.
+        groups (Dict[str, Hashable], optional): Records are only merged with
+            records of the same group, e.g. the same requested fields.
+        max_distance (int): Largest SimHash distance of near duplicates.
+        fingerprints (Dict[str, Tuple[str, str, str]], optional): Precomputed
+            ``fingerprint`` results by record ID, to skip parsing again.
+
+    Returns:
+        Tuple[List[str], Dict[str, List[str]], Counter]: The representative
+        IDs in input order, the duplicate IDs of each representative (to
+        reattach its result to), and ``exact``/``near`` counts.
+    """
+    groups = groups or {}
+    fingerprints = fingerprints or {}
+    index = DedupIndex(max_distance)
+
+    representatives, duplicates, stats = [], {}, Counter()
+    for record_id, html in records.items():
+        record_fingerprint = fingerprints.get(record_id) or fingerprint(html)
+        group = groups.get(record_id)
+        match, kind = index.find(record_fingerprint, group)
+        if match:
+            duplicates[match].append(record_id)
+            stats[kind] += 1
+            continue
+        representatives.append(record_id)
+        duplicates[record_id] = []
+        index.add(record_id, record_fingerprint, group)
+    return representatives, {k: v for k, v in duplicates.items() if v}, stats
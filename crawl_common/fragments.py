@@ -0,0 +1,328 @@
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from bs4.formatter import HTMLFormatter
+
+# scan drives bs4's html.parser builder directly; written against bs4 4.15.x
+try:
+    from bs4.builder import HTMLParserTreeBuilder
+    from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+except ImportError:  # a bs4 that moved its internals; scan falls back to bs4
+    BeautifulSoupHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; the other engines need only bs4
+    lxml = None
+
+ENGINES = ("scan", "lxml", "strainer", "bs4")
+# What str(tag) uses
+_FORMATTER = HTMLFormatter.REGISTRY["minimal"]
+_STEP = re.compile(r"^([a-zA-Z][\w-]*)?((?:\.[\w-]+)*)$")
+# Exercises what scan emulates: nesting repairs, voids, whitespace, raw text, entities, attribute quoting
+_CHECK_SELECTOR = "div.card p"
+_CHECK_HTML = """<!DOCTYPE html><html><head><meta charset="latin-1"><title>t</title></head><body>
+<div class="card x" data-a='say "hi"'><p class=" b  a ">one &amp; two &copy; &#169; <b>bold<i>both</b> after</p>
+<p>br<br/>img<img src=x.png alt="a<b">input<input disabled>  \n  <span>  </span></p>
+<p><!-- note --><script>if (a < b && c) {}</script><pre>
+  kept  </pre><textarea> raw &lt; </textarea></p></span></div>
+<div class="card"><p>unclosed<div class="card"><p>nested</p></div></div></body></html>"""
+
+Step = Tuple[Optional[str], List[str]]
+
+
+def parse_selector(selector: str) -> List[Step]:
+    """
+    Parses a simple CSS selector: ``tag``, ``.class`` or ``tag.class`` steps
+    joined by the descendant combinator, e.g. ``.l-adaptive-content table``.
+
+    Args:
+        selector (str): The selector.
+
+    Returns:
+        List[Step]: (tag or None, classes) per step.
+
+    Raises:
+        ValueError: For anything else (ids, attributes, child combinators, ...).
+    """
+    steps = []
+    for part in selector.split():
+        match = _STEP.match(part)
+        if not match or not part.strip("."):
+            raise ValueError(f"Unsupported selector step {part!r} in {selector!r}")
+        tag, classes = match.groups()
+        steps.append((tag.lower() if tag else None, [c for c in classes.split(".") if c]))
+    if not steps:
+        raise ValueError("Empty selector")
+    return steps
+
+
+def _matches(step: Step, tag: str, classes: List[str]) -> bool:
+    name, wanted = step
+    return (name is None or name == tag) and all(c in classes for c in wanted)
+
+
+class _Element:
+    __slots__ = ("name", "progress", "match", "preserve", "is_empty_element")
+
+    def __init__(self, name: str, progress: int, match: Optional[int], preserve: bool, is_empty_element: bool):
+        self.name = name
+        self.progress = progress
+        self.match = match
+        self.preserve = preserve
+        self.is_empty_element = is_empty_element
+
+
+class _FragmentWriter:
+    """
+    Serializes the elements matching a selector straight from the token stream.
+
+    Stands in for the ``BeautifulSoup`` object behind bs4's own html.parser
+    builder, so tokenizing, entity and attribute handling are bs4's. Tag
+    nesting follows bs4's rules (an end tag closes the most recent open
+    element of that name and everything opened after it; end tags with no
+    open element are ignored), and matches are written as the ``minimal``
+    formatter would, so each fragment equals ``str(tag)`` of a full parse.
+    No element or string objects are created.
+    """
+
+    def __init__(self, steps: List[Step]):
+        self.steps = steps
+        self.builder = HTMLParserTreeBuilder(store_line_numbers=False)
+        self.contains_replacement_characters = False
+        self.current_data = []
+        self.stack = []
+        self.open_counts = Counter()
+        self.preserve = 0
+        self.fragments = []  # the pieces of every match, in document order
+        self.active = []  # indices of the matches being written
+        self.start_tags = {}  # serialized start tag by its source text; cards repeat the same tags
+        self.parser = None
+
+    def run(self, html: str) -> List[str]:
+        self.parser = BeautifulSoupHTMLParser(self, convert_charrefs=False)
+        self.parser.feed(html)
+        self.parser.close()
+        self.endData()
+        while self.stack:
+            self._close(self.stack.pop())
+        return ["".join(pieces) for pieces in self.fragments]
+
+    def _write(self, text: str) -> None:
+        for index in self.active:
+            self.fragments[index].append(text)
+
+    def _start_tag(self, name: str, attrs, empty: bool) -> str:
+        source = self.parser.get_starttag_text()
+        if source not in self.start_tags:
+            self.start_tags[source] = self._format_start_tag(source, name, attrs, empty)
+        return self.start_tags[source]
+
+    def _format_start_tag(self, source: str, name: str, attrs, empty: bool) -> str:
+        if name == "meta":  # its charset is rewritten on output; leave that to bs4
+            return str(_parse_fragment(source))
+        attrs = self.builder._replace_cdata_list_attribute_values(name, dict(attrs))
+        parts = []
+        for key, value in sorted(attrs.items()):
+            if isinstance(value, list):
+                value = " ".join(value)
+            parts.append(f"{key}={_FORMATTER.quoted_attribute_value(_FORMATTER.attribute_value(value))}")
+        attributes = " " + " ".join(parts) if parts else ""
+        return f"<{name}{attributes}{_FORMATTER.void_element_close_prefix if empty else ''}>"
+
+    def handle_starttag(self, name, namespace, nsprefix, attrs, sourceline=None, sourcepos=None):
+        self.endData()
+        classes = (attrs.get("class") or "").split()
+        progress = self.stack[-1].progress if self.stack else 0
+        match = None
+        if progress >= len(self.steps) - 1 and _matches(self.steps[-1], name, classes):
+            match = len(self.fragments)
+            self.fragments.append([])
+            self.active.append(match)
+        if progress < len(self.steps) - 1 and _matches(self.steps[progress], name, classes):
+            progress += 1
+        preserve = name in self.builder.preserve_whitespace_tags
+        element = _Element(name, progress, match, preserve, self.builder.can_be_empty_element(name))
+        if self.active:
+            self._write(self._start_tag(name, attrs, element.is_empty_element))
+        self.stack.append(element)
+        self.open_counts[name] += 1
+        self.preserve += preserve
+        return element
+
+    def _close(self, element: _Element) -> None:
+        self.open_counts[element.name] -= 1
+        self.preserve -= element.preserve
+        if self.active and not element.is_empty_element:
+            self._write(f"</{element.name}>")
+        if element.match is not None:
+            self.active.remove(element.match)
+
+    def handle_endtag(self, name, nsprefix=None):
+        self.endData()
+        if not self.open_counts[name]:
+            return
+        while self.stack:
+            element = self.stack.pop()
+            self._close(element)
+            if element.name == name:
+                break
+
+    def handle_data(self, data):
+        self.current_data.append(data)
+
+    def endData(self, containerClass=None):
+        if not self.current_data:
+            return
+        data = "".join(self.current_data)
+        self.current_data = []
+        if not self.preserve and not data.strip(BeautifulSoup.ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        if not self.active:
+            return
+        if containerClass is not None:  # comments, doctypes, CDATA and the like
+            self._write(containerClass.PREFIX + data + containerClass.SUFFIX)
+        elif self.stack and self.stack[-1].name in _FORMATTER.cdata_containing_tags:
+            self._write(data)
+        else:
+            self._write(_FORMATTER.substitute(data))
+
+
+def _parse_fragment(markup: str) -> Optional[Tag]:
+    soup = BeautifulSoup(markup, "html.parser")
+    return next((node for node in soup.contents if isinstance(node, Tag)), None)
+
+
+def _strainer(step: Step) -> SoupStrainer:
+    tag, classes = step
+
+    def has_classes(value):
+        tokens = value.split() if isinstance(value, str) else value or []
+        return all(c in tokens for c in classes)
+
+    return SoupStrainer(tag, class_=has_classes if classes else None)
+
+
+def parse_page(html: str):
+    """
+    Parses a page once with lxml, to share between ``select_tags`` calls.
+
+    Args:
+        html (str): The page HTML.
+
+    Returns:
+        lxml.html.HtmlElement: The root, or None for an empty page.
+    """
+    if not html or not html.strip():
+        return None
+    return lxml.html.document_fromstring(html)
+
+
+def _xpath(steps: List[Step]) -> str:
+    parts = []
+    for tag, classes in steps:
+        tests = "".join(f"[contains(concat(' ', normalize-space(@class), ' '), ' {c} ')]" for c in classes)
+        parts.append(f"{tag or '*'}{tests}")
+    return "//" + "//".join(parts)
+
+
+_scan_ok = None
+
+
+def _scan_checked() -> bool:
+    """
+    Whether ``scan`` gives the full parse's output on this bs4, checked once.
+
+    ``scan`` relies on bs4 internals; when they are missing or behave
+    differently, the engines built on it fall back to ``bs4``.
+    """
+    global _scan_ok
+    if _scan_ok is None:
+        try:
+            expected = [str(tag) for tag in BeautifulSoup(_CHECK_HTML, "html.parser").select(_CHECK_SELECTOR)]
+            _scan_ok = _FragmentWriter(parse_selector(_CHECK_SELECTOR)).run(_CHECK_HTML) == expected
+        except Exception:  # missing or changed internals
+            _scan_ok = False
+        if not _scan_ok:
+            print("⚠️ The scan engine does not match this bs4 version; using the full bs4 parse instead")
+    return _scan_ok
+
+
+def select_fragments(html: str, selector: str, engine: str = "scan", tree=None) -> List[str]:
+    """
+    Returns the HTML of every element matching ``selector`` without a full
+    bs4 parse of the page.
+
+    Engines:
+    - ``scan`` (default): one pass of bs4's own tokenizer writes out the
+      matches as it goes; no element objects are built, so time drops by
+      about half and memory by far more. Equal to the full parse by
+      construction; if a self-check against ``BeautifulSoup.select`` fails
+      on the installed bs4 (tested with 4.15.x), ``bs4`` is used instead.
+    - ``lxml``: libxml2 parses the page, or ``tree`` from ``parse_page`` is
+      shared between selectors, and only the matches are parsed with
+      ``html.parser``. Fastest when the matches are a small part of a big
+      page, but libxml2 repairs malformed markup differently, so check a
+      site with ``python -m crawl_common.bench_fragments`` first. Falls back
+      to ``scan`` without lxml.
+    - ``strainer``: ``html.parser`` with a ``SoupStrainer`` on the first
+      step (parse-only filtering); only matching subtrees become objects.
+    - ``bs4``: the full parse, kept as the reference.
+
+    Matches nested inside other matches are returned too, in document order.
+
+    Args:
+        html (str): The page HTML.
+        selector (str): A selector ``parse_selector`` accepts.
+        engine (str): One of ``ENGINES``.
+        tree (lxml.html.HtmlElement, optional): A parsed page for ``lxml``.
+
+    Returns:
+        List[str]: ``str(tag)`` of each match, as the full parse gives it.
+    """
+    if engine == "lxml" and lxml is None:
+        engine = "scan"
+    if engine == "scan" and _scan_checked():
+        return _FragmentWriter(parse_selector(selector)).run(html)
+    if engine == "scan":
+        engine = "bs4"
+    return [str(tag) for tag in select_tags(html, selector, engine, tree)]
+
+
+def select_tags(html: str, selector: str, engine: str = "scan", tree=None) -> List[Tag]:
+    """
+    Returns every element matching ``selector`` as a bs4 ``Tag``.
+
+    For ``scan`` and ``lxml`` only the matches are parsed, each on its own
+    tree, so changes to one tag do not show in another that contains it.
+
+    Args:
+        html (str): The page HTML.
+        selector (str): A selector ``parse_selector`` accepts.
+        engine (str): One of ``ENGINES``; see ``select_fragments``.
+        tree (lxml.html.HtmlElement, optional): A parsed page for ``lxml``.
+
+    Returns:
+        List[Tag]: The matching elements.
+    """
+    steps = parse_selector(selector)
+    if engine == "lxml" and lxml is None:
+        engine = "scan"
+    if engine == "scan" and not _scan_checked():
+        engine = "bs4"
+    if engine == "scan":
+        markup = _FragmentWriter(steps).run(html)
+    elif engine == "lxml":
+        tree = tree if tree is not None else parse_page(html)
+        elements = tree.xpath(_xpath(steps)) if tree is not None else []
+        markup = [lxml.html.tostring(e, encoding="unicode", with_tail=False) for e in elements]
+    elif engine == "strainer":
+        return BeautifulSoup(html, "html.parser", parse_only=_strainer(steps[0])).select(selector)
+    elif engine == "bs4":
+        return BeautifulSoup(html, "html.parser").select(selector)
+    else:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {ENGINES}")
+    tags = [_parse_fragment(fragment) for fragment in markup]
+    return [tag for tag in tags if tag is not None]
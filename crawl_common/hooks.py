@@ -0,0 +1,30 @@
+import inspect
+from typing import Callable
+
+
+def add_hook(crawler, hook_type: str, hook: Callable) -> None:
+    """
+    Registers a browser hook without replacing one that is already set.
+
+    crawl4ai keeps a single function per hook type, so when a hook is
+    already registered the two are chained: the existing one runs first,
+    then ``hook``, and the page returned by ``hook`` is passed on.
+
+    Args:
+        crawler (AsyncWebCrawler): The crawler whose browser strategy gets the hook.
+        hook_type (str): crawl4ai hook name, e.g. ``"before_goto"``.
+        hook (Callable): Async hook taking the page and keyword arguments.
+    """
+    strategy = crawler.crawler_strategy
+    previous = strategy.hooks.get(hook_type)
+    if previous is None:
+        strategy.set_hook(hook_type, hook)
+        return
+
+    async def chained(*args, **kwargs):
+        result = previous(*args, **kwargs)
+        if inspect.isawaitable(result):
+            await result
+        return await hook(*args, **kwargs)
+
+    strategy.set_hook(hook_type, chained)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Optional
+
+
+def record_key(model: str, prompt_version: str, record: str) -> str:
+    """
+    Cache key of one LLM input record.
+
+    Whitespace is collapsed first, so re-scraped HTML that only differs in
+    indentation or line breaks still hits.
+
+    Args:
+        model (str): The model name.
+        prompt_version (str): Version tag of the prompt template.
+        record (str): The record as it is sent to the model.
+
+    Returns:
+        str: A sha256 hex digest.
+    """
+    normalized = " ".join(record.split())
+    return hashlib.sha256(f"{model}\0{prompt_version}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent cache of parsed LLM results, one entry per input record.
+
+    Entries are keyed by (model, prompt template version, normalized record
+    hash), so changing the prompt or the model invalidates them without
+    deleting anything. The least recently used entries are evicted once the
+    stored results exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: str = ".llm_cache.sqlite", max_bytes: int = 512 * 1024**2):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            """
+        )
+
+    def get(self, model: str, prompt_version: str, record: str) -> Optional[Any]:
+        """
+        Looks up the cached result of a record.
+
+        Args:
+            model (str): The model name.
+            prompt_version (str): Version tag of the prompt template.
+            record (str): The record as it is sent to the model.
+
+        Returns:
+            Optional[Any]: The parsed JSON result, or None on a miss.
+        """
+        key = record_key(model, prompt_version, record)
+        row = self.db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.db.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, model: str, prompt_version: str, record: str, result: Any) -> None:
+        """
+        Stores the parsed result of a record.
+
+        Args:
+            model (str): The model name.
+            prompt_version (str): Version tag of the prompt template.
+            record (str): The record as it was sent to the model.
+            result (Any): JSON-serializable result.
+        """
+        data = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO results (key, model, prompt_version, result, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record_key(model, prompt_version, record), model, prompt_version, data, len(data), now, now),
+        )
+
+    def commit(self) -> None:
+        """Writes pending entries and access times, then evicts if needed."""
+        self.db.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """Drops least recently used entries until the cache fits ``max_bytes``."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+        self.db.commit()
+
+    def stats(self) -> dict:
+        entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self.commit()
+        self.db.close()
@@ -0,0 +1,55 @@
+import json
+from typing import List, Tuple
+
+
+def salvage_json_array(text: str) -> Tuple[List[dict], bool]:
+    """
+    Recovers every complete object from a possibly truncated JSON array.
+
+    Models that hit their output limit stop mid-object, which makes the whole
+    array unparsable even though most of it is fine. This decodes the array
+    one element at a time and keeps the objects that finished.
+
+    Args:
+        text (str): The raw model output, expected to be ``[{...}, {...}, ...]``.
+
+    Returns:
+        Tuple[List[dict], bool]: The complete objects, and whether the array
+        itself was complete.
+    """
+    decoder = json.JSONDecoder()
+    objects = []
+    start = text.find("[")
+    if start < 0:
+        return objects, False
+
+    pos = start + 1
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text):
+            return objects, False
+        if text[pos] == "]":
+            return objects, True
+        try:
+            value, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return objects, False
+        if isinstance(value, dict):
+            objects.append(value)
+
+
+def response_tokens(response) -> int:
+    """
+    Total tokens billed for a response, prompt plus output.
+
+    Args:
+        response (GenerateContentResponse): The model response.
+
+    Returns:
+        int: Billed tokens, or 0 when the response has no usage metadata.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return 0
+    return (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
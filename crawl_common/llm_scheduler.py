@@ -0,0 +1,194 @@
+import asyncio
+import random
+import re
+import time
+from collections import deque
+from typing import Optional
+
+# Free-tier limits of gemini-2.5-flash-lite
+DEFAULT_TPM = 250_000
+DEFAULT_RPM = 15
+# Fallback when a 429 carries no RetryInfo
+DEFAULT_RETRY_DELAY = 30.0
+# Longest a request waits out 429s before giving up, e.g. on an exhausted daily quota
+MAX_QUOTA_WAIT_S = 600.0
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count used to reserve quota before a request is sent.
+
+    Args:
+        text (str): The prompt.
+
+    Returns:
+        int: Estimated input tokens.
+    """
+    return len(text) // 4 + 1
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    Tells whether an API error is a 429 RESOURCE_EXHAUSTED.
+
+    Args:
+        error (Exception): The raised error.
+
+    Returns:
+        bool: True for quota errors.
+    """
+    return getattr(error, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def retry_delay(error: Exception) -> Optional[float]:
+    """
+    Reads the server's retry hint from a 429 error.
+
+    Uses the ``google.rpc.RetryInfo`` detail when present, otherwise the
+    "Please retry in Ns" text of the message.
+
+    Args:
+        error (Exception): The raised error.
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the error has no hint.
+    """
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []):
+            if detail.get("@type", "").endswith("google.rpc.RetryInfo") and "retryDelay" in detail:
+                return float(str(detail["retryDelay"]).rstrip("s"))
+    match = re.search(r"retry in ([\d.]+)s", str(error))
+    return float(match.group(1)) if match else None
+
+
+class QuotaScheduler:
+    """
+    Paces Gemini requests to stay under a tokens- and requests-per-minute quota.
+
+    Every request reserves its estimated input tokens in a sliding
+    60-second window and is only sent once the window has room, so as many
+    requests run in parallel as the quota allows. The reservation is
+    corrected to the real ``prompt_token_count`` once the response arrives;
+    with a ``TokenCounter`` the estimate comes from it and the real count
+    calibrates it in turn.
+    A 429 pauses all submissions for the server's ``retryDelay`` and the
+    request is queued again, until it has been waiting on quota for
+    ``max_quota_wait_s``; then the 429 is raised, so a quota that never
+    clears fails the request instead of hanging the run. Other errors are
+    retried with backoff ``max_retries`` times before being raised.
+    """
+
+    def __init__(
+        self,
+        client,
+        tpm: int = DEFAULT_TPM,
+        rpm: int = DEFAULT_RPM,
+        max_concurrency: int = 4,
+        headroom: float = 0.9,
+        max_retries: int = 3,
+        counter=None,
+        max_quota_wait_s: float = MAX_QUOTA_WAIT_S,
+    ):
+        self.client = client
+        self.counter = counter
+        self.token_budget = int(tpm * headroom)
+        self.rpm = rpm
+        self.max_retries = max_retries
+        self.max_quota_wait_s = max_quota_wait_s
+        self.window = deque()  # [sent_at, tokens] per request of the last minute
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.stats = {"requests": 0, "tokens": 0, "quota_retries": 0, "quota_failures": 0, "error_retries": 0, "waited_s": 0.0}
+
+    async def _reserve(self, tokens: int) -> list:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                while self.window and now - self.window[0][0] >= 60:
+                    self.window.popleft()
+                wait = self.paused_until - now
+                if wait <= 0:
+                    used = sum(entry[1] for entry in self.window)
+                    # A request larger than the whole budget still goes out alone
+                    if len(self.window) < self.rpm and (used + tokens <= self.token_budget or not self.window):
+                        entry = [now, tokens]
+                        self.window.append(entry)
+                        return entry
+                    # Re-check early: finished requests may shrink their reservation
+                    wait = min(1.0, 60 - (now - self.window[0][0]))
+                self.stats["waited_s"] += wait
+                await asyncio.sleep(wait)
+
+    async def generate(self, model: str, contents: str, config=None, tokens: Optional[int] = None):
+        """
+        Sends one ``generate_content`` request once the quota allows it.
+
+        Args:
+            model (str): The Gemini model name.
+            contents (str): The prompt.
+            config (GenerateContentConfig, optional): Request config.
+            tokens (int, optional): Input token estimate; defaults to the counter's
+                count, or ``estimate_tokens(contents)`` without a counter.
+
+        Returns:
+            GenerateContentResponse: The model response.
+
+        Raises:
+            Exception: The API error, once retries (or the quota wait) run out.
+        """
+        if not tokens:
+            tokens = self.counter.count(contents) if self.counter else estimate_tokens(contents)
+        errors = 0
+        quota_deadline = None
+        while True:
+            async with self.slots:
+                entry = await self._reserve(tokens)
+                self.stats["requests"] += 1
+                try:
+                    response = await self.client.aio.models.generate_content(
+                        model=model, contents=contents, config=config
+                    )
+                except Exception as e:
+                    if is_quota_error(e):
+                        delay = retry_delay(e) or DEFAULT_RETRY_DELAY
+                        entry[1] = 0  # the pause below covers the quota instead
+                        now = time.monotonic()
+                        quota_deadline = quota_deadline or now + self.max_quota_wait_s
+                        if now + delay > quota_deadline:
+                            self.stats["quota_failures"] += 1
+                            print(f"❌ Quota still exhausted after {self.max_quota_wait_s:.0f}s of retries; giving up on this request")
+                            raise
+                        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                        self.stats["quota_retries"] += 1
+                        print(f"⏳ Quota exhausted, requeueing request in {delay:.1f}s")
+                        continue
+                    errors += 1
+                    if errors > self.max_retries or getattr(e, "code", 500) < 500:
+                        raise
+                    self.stats["error_retries"] += 1
+                    delay = random.uniform(0, 2 ** errors)
+                    print(f"⚠️ Request failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+            usage = getattr(response, "usage_metadata", None)
+            if usage and usage.prompt_token_count:
+                entry[1] = usage.prompt_token_count
+                if self.counter:
+                    self.counter.observe(contents, usage.prompt_token_count)
+            self.stats["tokens"] += entry[1]
+            return response
+
+    def summary(self) -> str:
+        """
+        Formats request, token and retry counts.
+
+        Returns:
+            str: A one-line summary.
+        """
+        s = self.stats
+        return (f"{s['requests']} requests, {s['tokens']} input tokens, {s['quota_retries']} quota retries "
+                f"({s['quota_failures']} given up), "
+                f"{s['error_retries']} error retries, {s['waited_s']:.1f}s waiting for quota")
@@ -0,0 +1,116 @@
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup
+
+# Per-site field rules. Each field lists (selector, attribute, confidence)
+# candidates in priority order; attribute None means the element text. A value
+# only counts when it also matches the field's "valid" pattern.
+SITE_FIELD_RULES = {
+    "daraz": {
+        "url": {
+            "candidates": [(".RfADt a[href]", "href", 1.0), ("a[href*='/products/']", "href", 0.9), ("a[href]", "href", 0.5)],
+            "valid": r"/products/.+\.html",
+        },
+        "photo": {
+            "candidates": [("img[type=product]", "src", 1.0), ("img[data-src]", "data-src", 0.9), ("img[src]", "src", 0.5)],
+            "valid": r"^(https?:)?//",
+        },
+        "title": {
+            "candidates": [(".RfADt a[title]", "title", 1.0), ("img[alt]", "alt", 0.9), ("a[title]", "title", 0.5)],
+            "valid": r"\w{2,}",
+        },
+        "price": {
+            "candidates": [("span.ooOxS", None, 1.0)],
+            "valid": r"^Rs\.?\s*[\d,]+(\.\d+)?$",
+        },
+        "units_sold": {
+            "candidates": [("._1cEkb > span", None, 1.0)],
+            "valid": r"^[\d.,]+\s*[Kk]?\+?\s*sold$",
+        },
+        "location": {
+            "candidates": [("span.oa6ri", "title", 1.0), ("span.oa6ri", None, 0.9)],
+            "valid": r"\w{2,}",
+        },
+    },
+}
+# Fields a record needs before it can skip the LLM
+SITE_REQUIRED_FIELDS = {
+    "daraz": ["url", "photo", "title", "price", "location"],
+}
+# Fields the LLM may still be asked for although no rule extracts them
+SITE_LLM_ONLY_FIELDS = {
+    "daraz": ["rating"],
+}
+MIN_CONFIDENCE = 0.9
+
+
+def _units_sold(text: str) -> Optional[int]:
+    match = re.match(r"([\d.,]+)\s*([Kk]?)", text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    return int(value * 1000) if match.group(2) else int(value)
+
+
+# Turns a validated string into the value written to the output
+FIELD_CONVERTERS = {
+    "units_sold": _units_sold,
+    "url": lambda v: "https:" + v if v.startswith("//") else v,
+    "photo": lambda v: "https:" + v if v.startswith("//") else v,
+}
+
+
+def pre_extract(html: Union[str, BeautifulSoup], site: str) -> Tuple[Dict[str, object], Dict[str, float]]:
+    """
+    Extracts the site's fields from one record with CSS selectors.
+
+    Args:
+        html (str | BeautifulSoup): The record HTML, e.g. one product card,
+            or its parsed tree.
+        site (str): Key of ``SITE_FIELD_RULES``.
+
+    Returns:
+        Tuple[Dict[str, object], Dict[str, float]]: Field values (None when not
+        found) and the confidence of each value, 0.0 for missing ones.
+    """
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, "html.parser")
+    data, confidence = {}, {}
+    for field, rule in SITE_FIELD_RULES[site].items():
+        data[field], confidence[field] = None, 0.0
+        for selector, attr, weight in rule["candidates"]:
+            element = soup.select_one(selector)
+            if element is None:
+                continue
+            value = element.get(attr) if attr else element.get_text(" ", strip=True)
+            value = " ".join(value.split()) if isinstance(value, str) else None
+            if value and re.search(rule["valid"], value):
+                convert = FIELD_CONVERTERS.get(field)
+                data[field] = convert(value) if convert else value
+                confidence[field] = weight
+                break
+    for field in SITE_LLM_ONLY_FIELDS.get(site, []):
+        data[field], confidence[field] = None, 0.0
+    return data, confidence
+
+
+def residual_fields(confidence: Dict[str, float], site: str, min_confidence: float = MIN_CONFIDENCE) -> List[str]:
+    """
+    Lists the fields that still need the LLM.
+
+    Returns an empty list when every required field was extracted with at
+    least ``min_confidence``; the record can then skip the LLM entirely.
+    Otherwise every field below the threshold is returned, optional ones
+    included, so the one LLM call fills the whole record.
+
+    Args:
+        confidence (Dict[str, float]): Per-field confidence from ``pre_extract``.
+        site (str): Key of ``SITE_REQUIRED_FIELDS``.
+        min_confidence (float): Lowest confidence accepted without the LLM.
+
+    Returns:
+        List[str]: Field names to request from the LLM.
+    """
+    if all(confidence.get(field, 0.0) >= min_confidence for field in SITE_REQUIRED_FIELDS[site]):
+        return []
+    return [field for field, score in confidence.items() if score < min_confidence]
@@ -0,0 +1,115 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from markdownify import MarkdownConverter
+
+from crawl_common.compact import UrlTable, compact_html
+from crawl_common.dedup import fingerprint
+from crawl_common.pre_extract import pre_extract, residual_fields
+
+
+def _timed(func: Callable, item):
+    start = time.process_time()
+    result = func(item)
+    return result, time.process_time() - start
+
+
+def parallel_map(
+    func: Callable,
+    items: Iterable,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+) -> Tuple[List, Dict[str, float]]:
+    """
+    Runs ``func`` over ``items`` on a process pool, timing each call.
+
+    Items are sent to the workers in chunks, so the pickling overhead is paid
+    per chunk rather than per item. ``func`` must be picklable: a module-level
+    function or a ``functools.partial`` of one.
+
+    Args:
+        func (Callable): The per-item function.
+        items (Iterable): The items.
+        workers (int, optional): Worker processes; defaults to the CPU count.
+        chunksize (int, optional): Items per chunk; defaults to about four
+            chunks per worker.
+
+    Returns:
+        Tuple[List, Dict[str, float]]: The results in input order, and CPU
+        time stats (see ``format_cpu_stats``).
+    """
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(items) // (workers * 4))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pairs = list(pool.map(partial(_timed, func), items, chunksize=chunksize))
+    wall = time.perf_counter() - start
+
+    cpu = sorted(seconds for _, seconds in pairs)
+    stats = {
+        "records": len(items),
+        "workers": workers,
+        "cpu_s": sum(cpu),
+        "wall_s": wall,
+        "mean_ms": 1000 * sum(cpu) / len(cpu) if cpu else 0.0,
+        "p95_ms": 1000 * cpu[int(0.95 * (len(cpu) - 1))] if cpu else 0.0,
+        "max_ms": 1000 * cpu[-1] if cpu else 0.0,
+    }
+    return [result for result, _ in pairs], stats
+
+
+def format_cpu_stats(stats: Dict[str, float]) -> str:
+    """
+    Formats ``parallel_map`` stats as one line.
+
+    Args:
+        stats (Dict[str, float]): The stats.
+
+    Returns:
+        str: Records, workers, CPU time per record and the speedup over one core.
+    """
+    speedup = stats["cpu_s"] / stats["wall_s"] if stats["wall_s"] else 0.0
+    return (f"{stats['records']} records on {stats['workers']} workers: {stats['cpu_s']:.1f}s CPU "
+            f"(mean {stats['mean_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, max {stats['max_ms']:.1f} ms per record) "
+            f"in {stats['wall_s']:.1f}s wall, {speedup:.1f}x speedup")
+
+
+def prepare_record(html: str, site: str) -> dict:
+    """
+    Does all per-record work before batching on a single parse.
+
+    Runs the site's rule-based extraction and the duplicate fingerprint on
+    the parsed tree. Records that still need the LLM are then compacted in
+    place and converted to markdown, once before compaction (to report the
+    savings) and once after.
+
+    Args:
+        html (str): The record HTML.
+        site (str): Key of ``SITE_FIELD_RULES``.
+
+    Returns:
+        dict: ``data``, ``confidence`` and ``fields`` (the residual fields)
+        for every record; ``fingerprint``, ``markdown``, ``compact_markdown``
+        and ``urls`` (short ID to URL) only when ``fields`` is not empty. The
+        IDs are only unique within the record; ``UrlTable.merge`` combines
+        the tables of several records.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    data, confidence = pre_extract(soup, site)
+    prepared = {"data": data, "confidence": confidence, "fields": residual_fields(confidence, site)}
+    if not prepared["fields"]:
+        return prepared
+
+    converter = MarkdownConverter()
+    urls = UrlTable()
+    prepared["fingerprint"] = fingerprint(soup)
+    prepared["markdown"] = converter.convert_soup(soup)
+    compact_html(soup, urls)
+    prepared["compact_markdown"] = converter.convert_soup(soup)
+    prepared["urls"] = urls.urls
+    return prepared
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from crawl_common.hooks import add_hook
+
+# Politeness budget in requests/second per host; hosts not listed use the default
+HOST_RATES = {
+    "www.theknot.com": 0.5,
+    "www.daraz.com.np": 1.0,
+    "us.misumi-ec.com": 0.5,
+    "www.mcmaster.com": 0.3,
+}
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 2
+
+
+class TokenBucket:
+    """
+    Token bucket that refills at ``rate`` tokens/second up to ``burst`` tokens.
+    """
+
+    def __init__(self, rate: float, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Takes one token, waiting for the bucket to refill if it is empty.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class HostRateLimiter:
+    """
+    Per-host rate limiter shared by every crawl entry point.
+
+    Each host gets its own token bucket, so waiting on a slow host never
+    stalls requests to other hosts. ``attach`` hooks it into a crawler so
+    every browser navigation, including the ones made by deep-crawl
+    strategies and ``arun_many``, takes a token first; ``wait`` can be
+    called directly for requests made outside the browser. ``reserve``
+    takes a navigation's token ahead of time, so callers that time the
+    request itself can keep the bucket wait out of that time.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, float]] = None,
+        default_rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+    ):
+        self.rates = dict(HOST_RATES if rates is None else rates)
+        self.default_rate = default_rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.waited: Dict[str, float] = {}
+        self.reserved: Counter = Counter()
+
+    def bucket(self, host: str) -> TokenBucket:
+        """
+        Returns the token bucket of a host, creating it on first use.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            TokenBucket: The bucket for that host.
+        """
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rates.get(host, self.default_rate), self.burst)
+        return self.buckets[host]
+
+    async def wait(self, url: str) -> float:
+        """
+        Waits until the host of ``url`` has budget for one more request.
+
+        Args:
+            url (str): The URL about to be requested.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if url.startswith(("raw:", "file:")):
+            return 0.0
+        host = urlsplit(url).hostname or ""
+        waited = await self.bucket(host).acquire()
+        self.waited[host] = self.waited.get(host, 0.0) + waited
+        return waited
+
+    async def reserve(self, url: str) -> float:
+        """
+        Takes the token for the next navigation to ``url`` now; the hook
+        installed by ``attach`` then lets that navigation through at once.
+
+        Args:
+            url (str): The URL about to be crawled.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = await self.wait(url)
+        self.reserved[url] += 1
+        return waited
+
+    def discard(self, url: str) -> None:
+        """
+        Drops an unused reservation, e.g. of an attempt that failed before
+        navigating, so no later navigation goes through without a token.
+
+        Args:
+            url (str): The URL passed to ``reserve``.
+        """
+        if self.reserved[url]:
+            self.reserved[url] -= 1
+
+    def attach(self, crawler) -> None:
+        """
+        Makes every browser navigation of ``crawler`` wait for a token.
+
+        Args:
+            crawler (AsyncWebCrawler): The crawler to throttle.
+        """
+
+        async def before_goto(page, context=None, url=None, **kwargs):
+            if url and self.reserved[url]:
+                self.reserved[url] -= 1
+            elif url:
+                await self.wait(url)
+            return page
+
+        add_hook(crawler, "before_goto", before_goto)
+
+    def summary(self) -> str:
+        """
+        Formats the time spent waiting per host.
+
+        Returns:
+            str: e.g. ``www.daraz.com.np: 12.4s``.
+        """
+        return ", ".join(f"{host}: {seconds:.1f}s" for host, seconds in self.waited.items()) or "no waits"
@@ -0,0 +1,121 @@
+import json
+import re
+from typing import Optional
+
+# Item selectors that mark a listing page as rendered, per site
+SITE_READY_SELECTORS = {
+    "daraz": ".Ms6aG",
+    "mcmaster": "div.hz",
+    "misumi": ".l-adaptive-content table",
+}
+
+_READY_ATTRS = re.compile(
+    r'<html[^>]*?data-ready-ms="(\d+)"[^>]*?data-ready-reason="(\w+)"[^>]*?data-ready-count="(\d+)"',
+    re.IGNORECASE,
+)
+
+
+def readiness_wait(
+    selector: str,
+    quiet_ms: int = 1500,
+    network_idle_ms: int = 2500,
+    max_wait_ms: int = 20000,
+    min_count: int = 1,
+) -> str:
+    """
+    Builds a ``wait_for`` condition that ends as soon as the page is usable.
+
+    The page counts as ready when one of these happens first:
+        - at least ``min_count`` nodes match ``selector`` and their number has
+          not changed for ``quiet_ms`` ("stable")
+        - no new network resource has been loaded for ``network_idle_ms``
+          after the document finished loading ("network_idle"), which covers
+          pages that never show the selector
+        - ``max_wait_ms`` has passed since the first check ("cap")
+
+    The wait time, the reason and the final item count are written as
+    ``data-ready-*`` attributes on ``<html>`` so they come back with the
+    rendered HTML; see ``read_readiness``.
+
+    Args:
+        selector (str): CSS selector of the items that make the page useful.
+        quiet_ms (int): How long the item count must stay unchanged.
+        network_idle_ms (int): How long the network must stay quiet.
+        max_wait_ms (int): Hard cap on the wait.
+        min_count (int): Minimum number of items before the count can settle.
+
+    Returns:
+        str: A ``js:`` condition for ``CrawlerRunConfig(wait_for=...)``.
+    """
+    return f"""js:() => {{
+        const now = performance.now();
+        let state = window.__readiness;
+        if (!state) {{
+            state = window.__readiness = {{
+                start: now, count: -1, countSince: now, resources: -1, resourcesSince: now, loaded: 0
+            }};
+            // The resource timing buffer stops at 250 entries by default; an observer keeps counting
+            performance.setResourceTimingBufferSize(100000);
+            new PerformanceObserver(list => {{ state.loaded += list.getEntries().length; }})
+                .observe({{type: "resource", buffered: true}});
+        }}
+        const count = document.querySelectorAll({json.dumps(selector)}).length;
+        if (count !== state.count) {{ state.count = count; state.countSince = now; }}
+        const resources = Math.max(state.loaded, performance.getEntriesByType("resource").length);
+        if (resources !== state.resources) {{ state.resources = resources; state.resourcesSince = now; }}
+
+        let reason = null;
+        if (count >= {min_count} && now - state.countSince >= {quiet_ms}) {{
+            reason = "stable";
+        }} else if (document.readyState === "complete" && now - state.resourcesSince >= {network_idle_ms}) {{
+            reason = "network_idle";
+        }} else if (now - state.start >= {max_wait_ms}) {{
+            reason = "cap";
+        }}
+        if (!reason) return false;
+
+        const root = document.documentElement;
+        root.setAttribute("data-ready-ms", String(Math.round(now - state.start)));
+        root.setAttribute("data-ready-reason", reason);
+        root.setAttribute("data-ready-count", String(count));
+        return true;
+    }}"""
+
+
+def read_readiness(html: Optional[str]) -> Optional[dict]:
+    """
+    Reads the readiness record left on ``<html>`` by ``readiness_wait``.
+
+    Args:
+        html (Optional[str]): The rendered HTML of the page.
+
+    Returns:
+        Optional[dict]: ``{"wait_s", "reason", "count"}``, or None when the
+        page was not rendered with a readiness wait.
+    """
+    if not html:
+        return None
+    match = _READY_ATTRS.search(html[:4096])
+    if not match:
+        return None
+    return {
+        "wait_s": int(match.group(1)) / 1000,
+        "reason": match.group(2),
+        "count": int(match.group(3)),
+    }
+
+
+def format_readiness(html: Optional[str]) -> str:
+    """
+    Formats the readiness record of a page for the crawl log.
+
+    Args:
+        html (Optional[str]): The rendered HTML of the page.
+
+    Returns:
+        str: A short summary such as ``ready after 1.8s (stable, 40 items)``.
+    """
+    ready = read_readiness(html)
+    if ready is None:
+        return "no readiness record"
+    return f"ready after {ready['wait_s']:.1f}s ({ready['reason']}, {ready['count']} items)"
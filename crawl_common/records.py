@@ -0,0 +1,64 @@
+import json
+import mmap
+import os
+from typing import Dict, Iterator
+
+RECORDS_FILE = "records.jsonl"
+
+
+class RecordWriter:
+    """
+    Writes scraped records as one JSON object per line.
+
+    Each record carries its source URL, its index on that page and its HTML.
+    JSON escapes every newline inside the HTML, so a record is always exactly
+    one line, however its markup is formatted.
+    """
+
+    def __init__(self, path: str = RECORDS_FILE):
+        self.path = path
+        self.count = 0
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, url: str, card: int, html: str) -> None:
+        self.f.write(json.dumps({"url": url, "card": card, "html": html}, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def flush(self) -> None:
+        self.f.flush()
+
+    def close(self) -> None:
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(path: str = RECORDS_FILE) -> Iterator[Dict[str, object]]:
+    """
+    Streams records from a file written by ``RecordWriter``.
+
+    The file is memory-mapped and read line by line, so it is never loaded
+    as one string. A last line cut short by an interrupted scrape is skipped.
+
+    Args:
+        path (str): The records file.
+
+    Yields:
+        Dict[str, object]: ``{"url", "card", "html"}`` per record, in file order.
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line in iter(mm.readline, b""):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith(b"\n"):
+                    raise
+                print(f"⚠️ Skipping truncated last record in {path}")
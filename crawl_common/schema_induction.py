@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional
+
+from crawl4ai import JsonCssExtractionStrategy
+
+SCHEMA_CACHE_DIR = ".schema_cache"
+# Share of held-out items that must come back with every required field
+MIN_SCHEMA_SCORE = 0.9
+
+
+def score_schema(schema: dict, samples: List[str], required_fields: List[str]) -> float:
+    """
+    Measures how well a CSS schema extracts the required fields.
+
+    Each sample scores the share of its extracted items that have every
+    required field filled; a sample without items scores 0.
+
+    Args:
+        schema (dict): A ``JsonCssExtractionStrategy`` schema.
+        samples (List[str]): HTML the schema has not been induced from.
+        required_fields (List[str]): Fields every item must have.
+
+    Returns:
+        float: The mean score over the samples, from 0.0 to 1.0.
+    """
+    if not samples:
+        return 0.0
+    strategy = JsonCssExtractionStrategy(schema)
+    total = 0.0
+    for html in samples:
+        try:
+            items = strategy.extract("raw:", html)
+        except Exception:
+            items = []
+        items = [item for item in items if isinstance(item, dict)]
+        if items:
+            complete = sum(1 for item in items if all(item.get(field) not in (None, "") for field in required_fields))
+            total += complete / len(items)
+    return total / len(samples)
+
+
+class SchemaStore:
+    """
+    Per-site CSS extraction schemas induced once by an LLM.
+
+    ``get`` first checks the cached schema against fresh samples. Only when
+    its score drops below ``min_score`` (the site layout changed) does it ask
+    the LLM for a new one. The LLM sees the first half of the samples and the
+    result is validated on the other half before it is cached. Bulk
+    extraction then runs ``JsonCssExtractionStrategy`` with no LLM calls.
+    """
+
+    def __init__(self, cache_dir: str = SCHEMA_CACHE_DIR, min_score: float = MIN_SCHEMA_SCORE):
+        self.cache_dir = cache_dir
+        self.min_score = min_score
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, site: str) -> str:
+        return os.path.join(self.cache_dir, f"{site}.json")
+
+    def load(self, site: str) -> Optional[dict]:
+        """
+        Reads the cached schema entry of a site.
+
+        Args:
+            site (str): The site key, e.g. ``"daraz"``.
+
+        Returns:
+            Optional[dict]: ``{"schema", "score", "induced_at"}``, or None.
+        """
+        try:
+            with open(self._path(site), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, site: str, schema: dict, score: float) -> None:
+        entry = {"schema": schema, "score": score, "induced_at": time.time()}
+        tmp_path = self._path(site) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self._path(site))
+
+    async def get(
+        self,
+        site: str,
+        samples: List[str],
+        required_fields: List[str],
+        query: str,
+        target_json_example: Optional[str] = None,
+        attempts: int = 3,
+        **llm_kwargs,
+    ) -> dict:
+        """
+        Returns a validated schema for a site, inducing one if needed.
+
+        Args:
+            site (str): The site key, e.g. ``"daraz"``.
+            samples (List[str]): Fresh HTML samples; at least two.
+            required_fields (List[str]): Fields every item must have.
+            query (str): What to extract, in plain words, for the LLM.
+            target_json_example (str, optional): Example of one extracted item.
+            attempts (int): Induction attempts before giving up.
+            **llm_kwargs: LLM settings passed to ``generate_schema``, e.g.
+                ``llm_config`` or, on Crawl4AI 0.4, ``provider`` and ``api_token``.
+
+        Returns:
+            dict: The schema.
+
+        Raises:
+            ValueError: If no induced schema reaches ``min_score`` on the held-out samples.
+        """
+        cached = self.load(site)
+        if cached:
+            score = score_schema(cached["schema"], samples, required_fields)
+            if score >= self.min_score:
+                print(f"📐 Using cached {site} schema (score {score:.2f} on {len(samples)} fresh samples)")
+                return cached["schema"]
+            print(f"📐 Cached {site} schema scores {score:.2f} on fresh samples; re-inducing")
+
+        half = max(1, len(samples) // 2)
+        induction, held_out = samples[:half], samples[half:] or samples[:half]
+        best_score = 0.0
+        for attempt in range(attempts):
+            schema = await asyncio.to_thread(
+                JsonCssExtractionStrategy.generate_schema,
+                html="\n".join(induction),
+                schema_type="CSS",
+                query=query,
+                target_json_example=target_json_example,
+                **llm_kwargs,
+            )
+            score = score_schema(schema, held_out, required_fields)
+            print(f"📐 Induced {site} schema, attempt {attempt + 1}: score {score:.2f} on {len(held_out)} held-out samples")
+            if score >= self.min_score:
+                self.save(site, schema, score)
+                return schema
+            best_score = max(best_score, score)
+        raise ValueError(f"No {site} schema reached {self.min_score} on held-out samples (best {best_score:.2f})")
@@ -0,0 +1,89 @@
+import json
+import re
+from typing import Optional
+
+_SCROLL_ATTRS = re.compile(
+    r'<html[^>]*?data-scroll-steps="(\d+)"[^>]*?data-scroll-gains="([\d,]*)"',
+    re.IGNORECASE,
+)
+
+
+def adaptive_scroll_js(
+    selector: str,
+    step_delay_ms: int = 800,
+    patience: int = 2,
+    max_steps: int = 20,
+) -> str:
+    """
+    Builds a ``js_code`` script that scrolls only while new items keep loading.
+
+    Each step scrolls one viewport down, waits ``step_delay_ms`` and counts
+    the nodes matching ``selector``. Scrolling stops once the count has been
+    unchanged for ``patience`` consecutive steps, or after ``max_steps``.
+    The number of steps and the items gained per step are written as
+    ``data-scroll-*`` attributes on ``<html>``; see ``read_scroll``.
+
+    Args:
+        selector (str): CSS selector of the listing items.
+        step_delay_ms (int): Pause after each scroll step.
+        patience (int): Unchanged steps in a row before giving up.
+        max_steps (int): Hard limit on scroll steps.
+
+    Returns:
+        str: JavaScript for ``CrawlerRunConfig(js_code=...)``.
+    """
+    return f"""
+        const selector = {json.dumps(selector)};
+        let count = document.querySelectorAll(selector).length;
+        const gains = [];
+        let unchanged = 0;
+        while (gains.length < {max_steps} && unchanged < {patience}) {{
+            window.scrollBy(0, window.innerHeight);
+            await new Promise(r => setTimeout(r, {step_delay_ms}));
+            const next = document.querySelectorAll(selector).length;
+            gains.push(next - count);
+            unchanged = next > count ? 0 : unchanged + 1;
+            count = next;
+        }}
+        const root = document.documentElement;
+        root.setAttribute("data-scroll-steps", String(gains.length));
+        root.setAttribute("data-scroll-gains", gains.join(","));
+        return {{ steps: gains.length, items: count, gains: gains }};
+    """
+
+
+def read_scroll(html: Optional[str]) -> Optional[dict]:
+    """
+    Reads the scroll record left on ``<html>`` by ``adaptive_scroll_js``.
+
+    Args:
+        html (Optional[str]): The rendered HTML of the page.
+
+    Returns:
+        Optional[dict]: ``{"steps", "gains"}``, or None when the page was not
+        scrolled with ``adaptive_scroll_js``.
+    """
+    if not html:
+        return None
+    match = _SCROLL_ATTRS.search(html[:4096])
+    if not match:
+        return None
+    gains = [int(g) for g in match.group(2).split(",") if g]
+    return {"steps": int(match.group(1)), "gains": gains}
+
+
+def format_scroll(html: Optional[str]) -> str:
+    """
+    Formats the scroll record of a page for the crawl log.
+
+    Args:
+        html (Optional[str]): The rendered HTML of the page.
+
+    Returns:
+        str: A short summary such as ``3 scroll steps, +20/+20/+0 items``.
+    """
+    scroll = read_scroll(html)
+    if scroll is None:
+        return "no scroll record"
+    gains = "/".join(f"+{g}" for g in scroll["gains"]) or "none"
+    return f"{scroll['steps']} scroll steps, {gains} items"
@@ -0,0 +1,212 @@
+import html
+from typing import Callable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Tag
+
+from crawl_common.tokens import split_by_units
+
+HEADER_JOINER = " - "
+
+
+def _span(cell: Tag, attr: str) -> int:
+    try:
+        return max(1, int(cell.get(attr, 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _is_header(cell: Tag) -> bool:
+    # Misumi marks header cells with class="headerCell" on plain <td>s
+    classes = " ".join(cell.get("class", [])).lower()
+    return cell.name == "th" or cell.find_parent("thead") is not None or "header" in classes
+
+
+def cell_text(cell: Tag) -> str:
+    """
+    Visible text of a cell; ``<br>`` becomes a line break, other whitespace collapses.
+
+    Args:
+        cell (Tag): A ``<td>`` or ``<th>``.
+
+    Returns:
+        str: The cleaned text, "" for an empty cell.
+    """
+    for br in cell.find_all("br"):
+        br.replace_with("\n")
+    lines = (" ".join(line.split()) for line in cell.get_text().split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def build_grid(table: Tag) -> Tuple[List[List[Optional[int]]], List[Tag], List[int]]:
+    """
+    Expands a table into a rectangular grid of cell references.
+
+    Every slot covered by a rowspan/colspan holds the index of the cell that
+    covers it, so merged values can be read back at every position they span.
+    Rows of nested tables are ignored.
+
+    Args:
+        table (Tag): The ``<table>`` element.
+
+    Returns:
+        Tuple[List[List[Optional[int]]], List[Tag], List[int]]: The grid (None
+        marks a slot no cell covers), the cells, and the row each cell starts in.
+    """
+    rows = [tr for tr in table.find_all("tr") if tr.find_parent("table") is table]
+    occupied, cells, origins = {}, [], []
+    for r, tr in enumerate(rows):
+        c = 0
+        for cell in tr.find_all(["td", "th"], recursive=False):
+            while (r, c) in occupied:
+                c += 1
+            rowspan = min(_span(cell, "rowspan"), len(rows) - r)
+            colspan = _span(cell, "colspan")
+            for dr in range(rowspan):
+                for dc in range(colspan):
+                    occupied[(r + dr, c + dc)] = len(cells)
+            cells.append(cell)
+            origins.append(r)
+            c += colspan
+
+    width = max((c for _, c in occupied), default=-1) + 1
+    grid = [[occupied.get((r, c)) for c in range(width)] for r in range(len(rows))]
+    return grid, cells, origins
+
+
+def normalize_table(table_html: str, table_index: int) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Converts an HTML table into ``{table_index, headers, rows}`` without an LLM.
+
+    Leading rows made only of header cells (``<th>``, ``<thead>`` or a
+    ``header`` class) form the header; for multi-row headers, the labels of the
+    distinct cells above each column are joined with " - ". Spanned values are
+    repeated in every row and column they cover, and empty cells become None.
+
+    Tables this cannot read reliably are flagged instead of guessed, so the
+    caller can hand them to the LLM: nested tables, no header rows, header
+    rows after data rows, rows that do not fill the grid, and columns whose
+    header is empty or shared with another column.
+
+    Args:
+        table_html (str): The ``<table>...</table>`` HTML.
+        table_index (int): Index stored in the result.
+
+    Returns:
+        Tuple[Optional[dict], Optional[str]]: The table and None, or None and
+        the reason the table is ambiguous.
+    """
+    soup = BeautifulSoup(table_html, "html.parser")
+    table = soup.find("table")
+    if table is None:
+        return None, "no table"
+    if table.find("table") is not None:
+        return None, "nested table"
+
+    grid, cells, origins = build_grid(table)
+    if not grid or not grid[0]:
+        return None, "empty table"
+    if any(slot is None for row in grid for slot in row):
+        return None, "ragged rows"
+    # A column covered by the same cells as its left neighbour in every row adds nothing
+    keep = [c for c in range(len(grid[0])) if c == 0 or any(row[c] != row[c - 1] for row in grid)]
+    grid = [[row[c] for c in keep] for row in grid]
+
+    header_rows = [
+        all(_is_header(cells[i]) for i in set(row) if origins[i] == r) and any(origins[i] == r for i in row)
+        for r, row in enumerate(grid)
+    ]
+    header_count = 0
+    while header_count < len(grid) and header_rows[header_count]:
+        header_count += 1
+    if header_count == 0:
+        return None, "no header row"
+    if any(header_rows[header_count:]):
+        return None, "header row inside body"
+
+    texts = [cell_text(cell) for cell in cells]
+    headers = []
+    for c in range(len(grid[0])):
+        parts, seen = [], set()
+        for r in range(header_count):
+            i = grid[r][c]
+            if i not in seen and texts[i]:
+                parts.append(texts[i].replace("\n", " "))
+            seen.add(i)
+        label = HEADER_JOINER.join(parts)
+        if not label:
+            return None, "unlabeled column"
+        if label in headers:
+            return None, "spanned header without sub-headers"
+        headers.append(label)
+
+    rows = [
+        {header: texts[i] or None for header, i in zip(headers, row)}
+        for row in grid[header_count:]
+    ]
+    return {"table_index": table_index, "headers": headers, "rows": rows}, None
+
+
+def split_table_rows(table_html: str, token_budget: int, count: Callable[[str], int]) -> List[str]:
+    """
+    Splits an oversized table into smaller tables at row boundaries.
+
+    Every part repeats the leading header rows, so it can be parsed on its
+    own, and rows tied together by a rowspan always stay in the same part.
+
+    Args:
+        table_html (str): The ``<table>...</table>`` HTML.
+        token_budget (int): Ceiling of tokens per part.
+        count (Callable[[str], int]): Token counter.
+
+    Returns:
+        List[str]: The parts in row order; ``[table_html]`` when the table
+        fits or has no rows to split at.
+    """
+    soup = BeautifulSoup(table_html, "html.parser")
+    table = soup.find("table")
+    if table is None or count(table_html) <= token_budget:
+        return [table_html]
+
+    grid, cells, origins = build_grid(table)
+    rows = [tr for tr in table.find_all("tr") if tr.find_parent("table") is table]
+    header_count = 0
+    while header_count < len(rows) and all(_is_header(cell) for cell in rows[header_count].find_all(["td", "th"], recursive=False)):
+        header_count += 1
+
+    # A row starts a new block unless a rowspan from above still covers it
+    blocks = []
+    for r in range(header_count, len(rows)):
+        row_html = str(rows[r])
+        if blocks and any(i is not None and origins[i] < r for i in grid[r]):
+            blocks[-1] += row_html
+        else:
+            blocks.append(row_html)
+    if len(blocks) < 2:
+        return [table_html]
+
+    header_html = "".join(str(tr) for tr in rows[:header_count])
+    if header_count and rows[0].find_parent("thead") is not None:
+        header_html = f"<thead>{header_html}</thead>"
+    attrs = "".join(f' {k}="{" ".join(v) if isinstance(v, list) else v}"' for k, v in table.attrs.items())
+    opening = f"<table{attrs}>{header_html}"
+    parts = split_by_units(blocks, count, token_budget, overhead=count(opening + "</table>"))
+    return [opening + "".join(part) + "</table>" for part in parts]
+
+
+def extract_page_tables(page_html: str) -> List[str]:
+    """
+    Returns every table of a page, nested ones included, from a single parse.
+
+    Entities are unescaped first, so tables stored escaped are found too, and
+    scripts, styles and SVGs are dropped.
+
+    Args:
+        page_html (str): The page, or the stored tables of one page.
+
+    Returns:
+        List[str]: The ``<table>...</table>`` HTML of each table, in document order.
+    """
+    soup = BeautifulSoup(html.unescape(page_html), "html.parser")
+    for tag in soup(["script", "style", "svg", "noscript"]):
+        tag.decompose()
+    return [str(table) for table in soup.find_all("table")]
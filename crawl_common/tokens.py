@@ -0,0 +1,167 @@
+import json
+import os
+import re
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+
+# Words, numbers and single punctuation marks; tracks BPE token counts far
+# better than characters, especially for markup-heavy text
+_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+CALIBRATION_FILE = ".token_calibration.json"
+# Gemini tokens per regex piece before any calibration
+DEFAULT_RATIO = 1.1
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens for a Gemini model without a network call.
+
+    Uses Gemini's own local tokenizer (``google-genai`` with
+    ``sentencepiece`` installed) when it can be loaded, which gives exact
+    counts. Otherwise it falls back to a regex piece count scaled by a ratio
+    learned from the ``prompt_token_count`` of real responses (see
+    ``observe``). The ratio is saved to ``calibration_file``, so later runs
+    start calibrated.
+    """
+
+    def __init__(self, model: str, calibration_file: str = CALIBRATION_FILE):
+        self.model = model
+        self.calibration_file = calibration_file
+        self.tokenizer = None
+        try:
+            from google.genai.local_tokenizer import LocalTokenizer
+
+            self.tokenizer = LocalTokenizer(model_name=model)
+            self.tokenizer.count_tokens("warm up")
+        except Exception:
+            self.tokenizer = None
+        self.ratio = DEFAULT_RATIO
+        self.samples = 0
+        try:
+            with open(calibration_file, "r", encoding="utf-8") as f:
+                saved = json.load(f).get(model, {})
+            self.ratio = saved.get("ratio", DEFAULT_RATIO)
+            self.samples = saved.get("samples", 0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def pieces(self, text: str) -> int:
+        return len(_PIECES.findall(text))
+
+    def count(self, text: str) -> int:
+        """
+        Counts the tokens of a text.
+
+        Args:
+            text (str): The text to count.
+
+        Returns:
+            int: Exact tokens with the local tokenizer, else the calibrated estimate.
+        """
+        if self.tokenizer is not None:
+            return self.tokenizer.count_tokens(text).total_tokens
+        return int(self.pieces(text) * self.ratio) + 1
+
+    def observe(self, text: str, actual_tokens: int) -> None:
+        """
+        Refines the estimator with the real token count of a sent prompt.
+
+        Args:
+            text (str): The prompt that was sent.
+            actual_tokens (int): ``usage_metadata.prompt_token_count`` of its response.
+        """
+        if self.tokenizer is not None or not actual_tokens:
+            return
+        pieces = self.pieces(text)
+        if not pieces:
+            return
+        # Running mean over the first prompts, then a slow moving average
+        weight = max(1 / (self.samples + 1), 0.05)
+        self.ratio += weight * (actual_tokens / pieces - self.ratio)
+        self.samples += 1
+
+    def save(self) -> None:
+        """Persists the learned ratio for the next run."""
+        if self.tokenizer is not None:
+            return
+        try:
+            with open(self.calibration_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            saved = {}
+        saved[self.model] = {"ratio": self.ratio, "samples": self.samples}
+        tmp_path = self.calibration_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2)
+        os.replace(tmp_path, self.calibration_file)
+
+    def describe(self) -> str:
+        if self.tokenizer is not None:
+            return f"exact ({self.model} local tokenizer)"
+        return f"estimated ({self.ratio:.3f} tokens/piece from {self.samples} calibration samples)"
+
+
+def pack_records(
+    records: Sequence[Tuple[Hashable, int]],
+    token_budget: int,
+    max_records: Optional[int] = None,
+) -> List[List[Hashable]]:
+    """
+    Packs records into as few batches as possible under a token ceiling.
+
+    First-fit decreasing: records are placed largest first into the first
+    batch with room left. This stays within 11/9 of the optimal batch count
+    and fills batches close to the ceiling. A record larger than the ceiling
+    gets a batch of its own; split such records before packing.
+
+    Args:
+        records (Sequence[Tuple[Hashable, int]]): ``(key, tokens)`` pairs.
+        token_budget (int): Ceiling of the summed record tokens per batch.
+        max_records (int, optional): Ceiling of the record count per batch,
+            e.g. to keep the expected output under the model's output limit.
+
+    Returns:
+        List[List[Hashable]]: The keys of each batch, in input order within a batch.
+    """
+    order = {key: i for i, (key, _) in enumerate(records)}
+    batches, room = [], []
+    for key, tokens in sorted(records, key=lambda record: record[1], reverse=True):
+        for i, batch in enumerate(batches):
+            if tokens <= room[i] and (max_records is None or len(batch) < max_records):
+                batch.append(key)
+                room[i] -= tokens
+                break
+        else:
+            batches.append([key])
+            room.append(token_budget - tokens)
+    return [sorted(batch, key=order.get) for batch in batches]
+
+
+def split_by_units(units: List[str], count: Callable[[str], int], token_budget: int, overhead: int = 0) -> List[List[str]]:
+    """
+    Splits an oversized record at unit boundaries, e.g. table rows.
+
+    Args:
+        units (List[str]): The record's pieces in order.
+        count (Callable[[str], int]): Token counter.
+        token_budget (int): Ceiling per part.
+        overhead (int): Tokens every part carries anyway, e.g. repeated header rows.
+
+    Returns:
+        List[List[str]]: Consecutive groups of units; a unit larger than the
+        budget forms its own group.
+    """
+    parts, current, used = [], [], overhead
+    for unit in units:
+        tokens = count(unit)
+        if current and used + tokens > token_budget:
+            parts.append(current)
+            current, used = [], overhead
+        current.append(unit)
+        used += tokens
+    if current:
+        parts.append(current)
+    return parts